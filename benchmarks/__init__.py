@@ -0,0 +1 @@
+"""Офлайн-бенчмарки против локальных заглушек API."""
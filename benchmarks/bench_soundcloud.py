@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+resolve + догрузка треков SoundCloud против заглушки с лимитом запросов.
+Запуск: python -m benchmarks.bench_soundcloud --tracks 2000 --rate 10
+"""
+import argparse
+import time
+
+import parsers.soundcloud_parser as sc
+from benchmarks.stub_soundcloud import StubSoundCloud
+
+SET_URL = "https://soundcloud.com/stub/sets/stub"
+
+
+def _run(stub: StubSoundCloud, workers: int) -> str:
+    requests_before, throttled_before = stub.requests, stub.throttled
+    start = time.perf_counter()
+    try:
+        obj = sc.resolve_soundcloud(SET_URL, "stub")
+        data = sc.parse_soundcloud_playlist(obj, client_id="stub", workers=workers)
+        complete = sum(1 for t in data["tracks"] if t["title"])
+        outcome = f"{complete}/{len(data['tracks'])} треков"
+    except Exception as e:
+        outcome = f"ОШИБКА: {e.__class__.__name__}"
+    elapsed = time.perf_counter() - start
+    return (
+        f"{elapsed:6.2f} с  {outcome}  запросов={stub.requests - requests_before} "
+        f"429={stub.throttled - throttled_before}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tracks", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=10, help="Лимит заглушки, запросов/сек")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля случайных 503")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    with StubSoundCloud(total=args.tracks, rate=args.rate, retry_after=args.retry_after,
+                        error_rate=args.error_rate) as stub:
+        sc.API_BASE = stub.base
+        max_retries = sc.MAX_RETRIES
+        for workers in args.workers:
+            sc.MAX_RETRIES = 0
+            print(f"workers={workers:<3} без ретраев: {_run(stub, workers)}")
+            time.sleep(1)
+            sc.MAX_RETRIES = max_retries
+            print(f"workers={workers:<3} с ретраями:  {_run(stub, workers)}")
+            time.sleep(1)
+
+
+if __name__ == "__main__":
+    main()
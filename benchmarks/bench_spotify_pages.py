@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Последовательная vs параллельная загрузка страниц плейлиста,
+затем обновление по snapshot_id против полной загрузки после вставки трека.
+Запуск: python -m benchmarks.bench_spotify_pages --tracks 1000 --latency 0.1
+"""
+import argparse
+import time
+
+from benchmarks.stub_spotify import StubSpotify, make_local_track, make_track, stub_client
+from parsers.spotify_parser import fetch_all_spotify_tracks, parse_spotify_playlist, refresh_spotify_playlist
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tracks", type=int, default=1000, help="Треков в плейлисте")
+    parser.add_argument("--latency", type=float, default=0.1, help="Задержка заглушки на запрос, сек")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with StubSpotify(total=args.tracks, latency=args.latency) as stub:
+        sp = stub_client(stub)
+        baseline = None
+        for workers in args.workers:
+            requests_before, bytes_before = stub.requests, stub.bytes_sent
+            start = time.perf_counter()
+            tracks = fetch_all_spotify_tracks(sp, "stubplaylist", workers=workers)
+            elapsed = time.perf_counter() - start
+            assert [t["spotify_id"] for t in tracks] == [f"stubtrack{i:012d}" for i in range(args.tracks)]
+            baseline = baseline or elapsed
+            print(
+                f"workers={workers:<3} {len(tracks)} треков  {elapsed:.3f} с  x{baseline / elapsed:.2f}  "
+                f"{stub.requests - requests_before} запросов, {(stub.bytes_sent - bytes_before) / 1024:.0f} КБ"
+            )
+
+        _bench_refresh(stub, sp, max(args.workers))
+
+
+def _bench_refresh(stub: StubSpotify, sp, workers: int):
+    """Сохранённый плейлист с локальным файлом, затем вставка нового трека: refresh против полной загрузки."""
+    stub.insert_track(0, make_local_track(0), "snap-local")
+    previous = parse_spotify_playlist(sp, "stubplaylist", workers=workers)
+    stub.insert_track(stub.total // 2, make_track(stub.total), "snap-new")
+
+    full = _timed(stub, "полная загрузка", lambda: parse_spotify_playlist(sp, "stubplaylist", workers=workers))
+    data = _timed(stub, "refresh", lambda: refresh_spotify_playlist(sp, "stubplaylist", previous, workers=workers)[0])
+    assert data["tracks"] == full["tracks"], "refresh разошёлся с полной загрузкой"
+
+
+def _timed(stub: StubSpotify, name: str, fetch):
+    requests_before, bytes_before = stub.requests, stub.bytes_sent
+    start = time.perf_counter()
+    data = fetch()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<16} {len(data['tracks'])} треков  {elapsed:.3f} с  "
+        f"{stub.requests - requests_before} запросов, {(stub.bytes_sent - bytes_before) / 1024:.0f} КБ"
+    )
+    return data
+
+
+if __name__ == "__main__":
+    main()
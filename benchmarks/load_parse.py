@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест /parse: запросов/сек при 1, 10 и 100 одновременных клиентах.
+Upstream — локальная заглушка Spotify, сеть и ключи не нужны.
+Кэш результатов /parse по умолчанию выключен, иначе мерились бы попадания в кэш, а не пул потоков;
+--cache включает его с настройками из окружения.
+Запуск: python -m benchmarks.load_parse --latency 0.05 --duration 5
+"""
+import argparse
+import socket
+import threading
+import time
+
+import requests
+import uvicorn
+
+import main
+from benchmarks.stub_spotify import StubSpotify, stub_client
+
+PLAYLIST_URL = "https://open.spotify.com/playlist/stubplaylist"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_api(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _run_clients(base: str, clients: int, duration: float) -> tuple[int, int]:
+    ok = errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        nonlocal ok, errors
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            r = session.get(f"{base}/parse", params={"url": PLAYLIST_URL}, timeout=120)
+            with lock:
+                if r.status_code == 200:
+                    ok += 1
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return ok, errors
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tracks", type=int, default=300, help="Треков в плейлисте заглушки")
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка заглушки на запрос, сек")
+    parser.add_argument("--duration", type=float, default=5.0, help="Длительность каждого прогона, сек")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--cache", action="store_true", help="Не выключать кэш результатов /parse")
+    args = parser.parse_args()
+
+    with StubSpotify(total=args.tracks, latency=args.latency) as stub:
+        main.SPOTIFY_CLIENT_ID = main.SPOTIFY_CLIENT_ID or "stub"
+        main.SPOTIFY_CLIENT_SECRET = main.SPOTIFY_CLIENT_SECRET or "stub"
+        main.get_spotify_client = lambda *_, **__: stub_client(stub)
+        if not args.cache:
+            main._cache.ttl = 0
+
+        port = _free_port()
+        server = _start_api(port)
+        try:
+            for clients in args.clients:
+                ok, errors = _run_clients(f"http://127.0.0.1:{port}", clients, args.duration)
+                print(f"clients={clients:<4} {ok / args.duration:8.1f} req/s  ok={ok} errors={errors}")
+        finally:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    run()
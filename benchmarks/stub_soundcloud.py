@@ -0,0 +1,128 @@
+"""Локальная заглушка SoundCloud API v2 с искусственным троттлингом (429 + Retry-After)."""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_track(i: int, full: bool = True) -> dict:
+    if not full:
+        # Так resolve отдаёт хвост большого плейлиста
+        return {"id": i, "kind": "track", "monetization_model": "NOT_APPLICABLE", "policy": "ALLOW"}
+    return {
+        "id": i,
+        "kind": "track",
+        "title": f"Track {i}",
+        "duration": 200000 + i,
+        "permalink_url": f"https://soundcloud.com/stub/track-{i}",
+        "user": {"id": i % 30, "username": f"user{i % 30}"},
+        "artwork_url": f"https://i1.sndcdn.com/artworks-{i}-large.jpg",
+    }
+
+
+class StubSoundCloud:
+    """Плейлист из total треков (полных — первые full_tracks), лимит rate запросов/сек.
+
+    Сверх лимита — 429 с Retry-After; error_rate — доля случайных 503.
+    """
+
+    def __init__(self, total: int = 1000, full_tracks: int = 5, latency: float = 0.02,
+                 rate: float | None = None, retry_after: float = 1.0, error_rate: float = 0.0):
+        self.total = total
+        self.full_tracks = full_tracks
+        self.latency = latency
+        self.rate = rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._tokens = rate or 0.0
+        self._last = time.monotonic()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _take_token(self) -> bool:
+        """Token bucket: ёмкость и скорость пополнения — rate."""
+        if not self.rate:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def route(self, path: str, query: dict):
+        if path == "/resolve":
+            return {
+                "kind": "playlist",
+                "title": "Stub set",
+                "tracks": [make_track(i, full=i < self.full_tracks) for i in range(self.total)],
+            }
+        if path == "/tracks":
+            ids = [int(i) for i in query.get("ids", [""])[0].split(",") if i]
+            return [make_track(i) for i in ids if 0 <= i < self.total]
+        return None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, body, headers: dict | None = None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                if not stub._take_token():
+                    with stub._lock:
+                        stub.throttled += 1
+                    self._send(429, {"error": "rate limited"}, {"Retry-After": f"{stub.retry_after:g}"})
+                    return
+                if stub.error_rate and random.random() < stub.error_rate:
+                    with stub._lock:
+                        stub.errors += 1
+                    self._send(503, {"error": "unavailable"})
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlparse(self.path)
+                body = stub.route(url.path, parse_qs(url.query))
+                if body is None:
+                    self._send(404, {"error": "not found"})
+                    return
+                self._send(200, body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,185 @@
+"""Локальная заглушка Spotify Web API для бенчмарков (без сети и ключей)."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_track(i: int) -> dict:
+    """Полный объект трека — с тем «мусором», который отдаёт настоящий API."""
+    tid = f"stubtrack{i:012d}"
+    return {
+        "id": tid,
+        "name": f"Track {i}",
+        "uri": f"spotify:track:{tid}",
+        "duration_ms": 180000 + i,
+        "artists": [{"name": f"Artist {i % 50}", "id": f"a{i % 50}", "uri": f"spotify:artist:a{i % 50}"}],
+        "album": {
+            "name": f"Album {i % 200}",
+            "images": [{"url": f"https://i.scdn.co/image/{i}_{s}", "height": s, "width": s} for s in (640, 300, 64)],
+            "available_markets": ["AD", "AE", "AR", "AT", "AU", "BE", "BG", "BR", "CA", "CH"] * 18,
+        },
+        "available_markets": ["AD", "AE", "AR", "AT", "AU", "BE", "BG", "BR", "CA", "CH"] * 18,
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{tid}"},
+        "external_ids": {"isrc": f"STUB{i:08d}"},
+        "popularity": i % 100,
+    }
+
+
+def make_local_track(i: int) -> dict:
+    """Локальный файл в плейлисте: без ID, uri вида spotify:local:..."""
+    return {
+        "id": None,
+        "name": f"Local {i}",
+        "uri": f"spotify:local:Local+Artist:Local+Album:Local+{i}:{200 + i}",
+        "duration_ms": 200000 + i,
+        "artists": [{"name": "Local Artist"}],
+        "album": {"name": "Local Album"},
+        "is_local": True,
+    }
+
+
+def _parse_fields(spec: str) -> dict:
+    """'a,b(c,d(e))' -> {'a': {}, 'b': {'c': {}, 'd': {'e': {}}}} (пустой dict — поле целиком)."""
+    def parse(i: int) -> tuple[dict, int]:
+        out: dict = {}
+        name = ""
+        while i < len(spec):
+            ch = spec[i]
+            if ch == "(":
+                out[name], i = parse(i + 1)
+                name = ""
+            elif ch == ")":
+                break
+            elif ch == ",":
+                if name:
+                    out[name] = {}
+                name = ""
+            else:
+                name += ch
+            i += 1
+        if name:
+            out[name] = {}
+        return out, i
+
+    return parse(0)[0]
+
+
+def project(obj, tree: dict):
+    """Оставить в ответе только поля из дерева fields, как делает Spotify."""
+    if not tree:
+        return obj
+    if isinstance(obj, list):
+        return [project(o, tree) for o in obj]
+    if isinstance(obj, dict):
+        return {k: project(obj[k], sub) for k, sub in tree.items() if k in obj}
+    return obj
+
+
+class StubSpotify:
+    """ThreadingHTTPServer с плейлистом из total треков и задержкой latency на запрос."""
+
+    def __init__(self, total: int = 1000, latency: float = 0.05, snapshot_id: str = "snap1"):
+        self.total = total
+        self.latency = latency
+        self.snapshot_id = snapshot_id
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._tracks = [make_track(i) for i in range(total)]
+        self._by_id = {t["id"]: t for t in self._tracks}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def prefix(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1/"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def insert_track(self, index: int, track: dict, snapshot_id: str) -> None:
+        """Изменить плейлист: вставить трек и сменить snapshot_id."""
+        self._tracks.insert(index, track)
+        if track.get("id"):
+            self._by_id[track["id"]] = track
+        self.total = len(self._tracks)
+        self.snapshot_id = snapshot_id
+
+    def playlist_page(self, playlist_id: str, limit: int, offset: int) -> dict:
+        items = [{"track": t} for t in self._tracks[offset:offset + limit]]
+        nxt = None
+        if offset + limit < self.total:
+            nxt = f"{self.prefix}playlists/{playlist_id}/tracks?offset={offset + limit}&limit={limit}"
+        return {"items": items, "total": self.total, "limit": limit, "offset": offset, "next": nxt}
+
+    def playlist(self, playlist_id: str) -> dict:
+        return {
+            "id": playlist_id,
+            "name": "Stub playlist",
+            "owner": {"display_name": "stub"},
+            "snapshot_id": self.snapshot_id,
+            "tracks": self.playlist_page(playlist_id, 100, 0),
+        }
+
+    def route(self, path: str, query: dict) -> dict | None:
+        parts = path.strip("/").split("/")
+        if len(parts) == 4 and parts[:2] == ["v1", "playlists"] and parts[3] == "tracks":
+            limit = int(query.get("limit", ["100"])[0])
+            offset = int(query.get("offset", ["0"])[0])
+            return self.playlist_page(parts[2], limit, offset)
+        if len(parts) == 3 and parts[:2] == ["v1", "playlists"]:
+            return self.playlist(parts[2])
+        if parts == ["v1", "tracks"]:
+            ids = query.get("ids", [""])[0].split(",")
+            return {"tracks": [self._by_id.get(i) for i in ids]}
+        return None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                body = stub.route(url.path, query)
+                if body is None:
+                    self.send_error(404)
+                    return
+                if query.get("fields"):
+                    body = project(body, _parse_fields(query["fields"][0]))
+                data = json.dumps(body).encode()
+                with stub._lock:
+                    stub.requests += 1
+                    stub.bytes_sent += len(data)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def stub_client(stub: StubSpotify):
+    """spotipy-клиент, который ходит в заглушку со статическим токеном."""
+    from spotipy import Spotify
+
+    sp = Spotify(auth="stub-token", retries=0)
+    sp.prefix = stub.prefix
+    return sp
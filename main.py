@@ -1,9 +1,23 @@
-
+import asyncio
+import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
-from parsers.spotify_parser import get_spotify_client, parse_spotify_playlist
-from parsers.soundcloud_parser import resolve_soundcloud, parse_soundcloud_playlist
+from parsers.cache import ResultCache
+from parsers.spotify_parser import (
+    build_http_session,
+    get_spotify_client,
+    get_spotify_playlist_meta,
+    get_spotify_snapshot_id,
+    iter_spotify_track_pages,
+    parse_spotify_playlist,
+    spotify_playlist_header,
+    spotify_playlist_id,
+)
+from parsers.soundcloud_parser import resolve_soundcloud, parse_soundcloud_playlist, soundcloud_canonical_key
 import requests
 
 load_dotenv()
@@ -11,25 +25,147 @@ load_dotenv()
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SOUNDCLOUD_CLIENT_ID = os.getenv("SOUNDCLOUD_CLIENT_ID")
+# Сколько страниц playlist_items грузить параллельно (1 — последовательно)
+SPOTIFY_FETCH_WORKERS = int(os.getenv("SPOTIFY_FETCH_WORKERS", "4"))
+# Сколько пачек /tracks?ids= для треков-заглушек SoundCloud грузить одновременно
+SOUNDCLOUD_FETCH_WORKERS = int(os.getenv("SOUNDCLOUD_FETCH_WORKERS", "4"))
+# Потоки для блокирующих вызовов spotipy/requests, чтобы не стопорить event loop
+PARSE_THREADS = int(os.getenv("PARSE_THREADS", "32"))
+# Кэш результатов /parse: TTL в секундах (0 — выключен), лимиты записей и памяти
+PARSE_CACHE_TTL = float(os.getenv("PARSE_CACHE_TTL", "600"))
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "256"))
+PARSE_CACHE_MAX_MB = float(os.getenv("PARSE_CACHE_MAX_MB", "64"))
+# Перед отдачей из кэша сверять snapshot_id плейлиста Spotify
+PARSE_CACHE_REVALIDATE = os.getenv("PARSE_CACHE_REVALIDATE") == "1"
 
 app = FastAPI(title="Music Parser API")
 
+_executor = ThreadPoolExecutor(max_workers=PARSE_THREADS, thread_name_prefix="parse")
+_cache = ResultCache(
+    ttl=PARSE_CACHE_TTL,
+    max_entries=PARSE_CACHE_MAX_ENTRIES,
+    max_bytes=int(PARSE_CACHE_MAX_MB * 1024 * 1024),
+)
+
+# Один клиент на процесс: токен и keep-alive соединения живут между запросами
+_spotify_client = None
+_spotify_lock = threading.Lock()
+
+
+def _get_spotify():
+    global _spotify_client
+    with _spotify_lock:
+        if _spotify_client is None:
+            session = build_http_session(pool_size=PARSE_THREADS * SPOTIFY_FETCH_WORKERS)
+            _spotify_client = get_spotify_client(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET, session=session)
+        return _spotify_client
+
+
+async def _run_blocking(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, fn, *args)
+
+
+def _cached_spotify(sp, playlist_id):
+    key = f"spotify:{playlist_id}"
+    cached = _cache.get(key)
+    if cached is not None:
+        if not PARSE_CACHE_REVALIDATE or get_spotify_snapshot_id(sp, playlist_id) == cached.get("snapshot_id"):
+            return cached
+        _cache.invalidate(key)
+    return None
+
+
+def _parse_spotify(url):
+    sp = _get_spotify()
+    playlist_id = spotify_playlist_id(url)
+    cached = _cached_spotify(sp, playlist_id)
+    if cached is not None:
+        return cached
+    result = parse_spotify_playlist(sp, playlist_id, workers=SPOTIFY_FETCH_WORKERS)
+    _cache.set(f"spotify:{playlist_id}", result)
+    return result
+
+
+def _parse_soundcloud(url):
+    key = f"soundcloud:{soundcloud_canonical_key(url)}"
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    json_obj = resolve_soundcloud(url, SOUNDCLOUD_CLIENT_ID)
+    result = parse_soundcloud_playlist(json_obj, client_id=SOUNDCLOUD_CLIENT_ID, workers=SOUNDCLOUD_FETCH_WORKERS)
+    _cache.set(key, result)
+    return result
+
+
+def _ndjson(obj):
+    return json.dumps(obj, ensure_ascii=False) + "\n"
+
+
+def _ndjson_result(result):
+    header = {k: v for k, v in result.items() if k != "tracks"}
+    return _ndjson(header) + "".join(_ndjson(t) for t in result.get("tracks", []))
+
+
+async def _stream_spotify(url):
+    """Заголовок плейлиста, затем по треку на строку — по мере прихода страниц playlist_items."""
+    try:
+        sp = _get_spotify()
+        playlist_id = spotify_playlist_id(url)
+        cached = await _run_blocking(_cached_spotify, sp, playlist_id)
+        if cached is not None:
+            yield _ndjson_result(cached)
+            return
+        meta = await _run_blocking(get_spotify_playlist_meta, sp, playlist_id)
+        yield _ndjson(spotify_playlist_header(playlist_id, meta))
+        pages = iter_spotify_track_pages(sp, playlist_id)
+        while True:
+            page = await _run_blocking(next, pages, None)
+            if page is None:
+                break
+            yield "".join(_ndjson(t) for t in page)
+    except Exception as e:
+        # Статус 200 уже отправлен — ошибка идёт последней строкой
+        yield _ndjson({"error": str(e)})
+
+
+async def _stream_soundcloud(url):
+    try:
+        yield _ndjson_result(await _run_blocking(_parse_soundcloud, url))
+    except Exception as e:
+        yield _ndjson({"error": str(e)})
+
+
+@app.on_event("shutdown")
+def _shutdown_executor():
+    _executor.shutdown(wait=False)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return _cache.stats()
+
+
 @app.get("/parse")
-async def parse(url: str = Query(..., description="Link to playlist/album/track")):
+async def parse(
+    url: str = Query(..., description="Link to playlist/album/track"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="json or ndjson (streamed)"),
+):
     url_l = url.lower()
     try:
         if "spotify.com" in url_l:
             if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET:
                 raise HTTPException(status_code=500, detail="Spotify credentials not set")
-            sp = get_spotify_client(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
-            result = parse_spotify_playlist(sp, url)
-            return result
+            if format == "ndjson":
+                return StreamingResponse(_stream_spotify(url), media_type="application/x-ndjson")
+            return await _run_blocking(_parse_spotify, url)
 
         if "soundcloud.com" in url_l:
             if not SOUNDCLOUD_CLIENT_ID:
                 raise HTTPException(status_code=500, detail="SoundCloud client_id not set")
-            json_obj = resolve_soundcloud(url, SOUNDCLOUD_CLIENT_ID)
-            return parse_soundcloud_playlist(json_obj)
+            if format == "ndjson":
+                return StreamingResponse(_stream_soundcloud(url), media_type="application/x-ndjson")
+            return await _run_blocking(_parse_soundcloud, url)
 
         raise HTTPException(status_code=400, detail="Unsupported platform / invalid url")
     except Exception as e:
@@ -1,17 +1,145 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
 import requests
+from requests.adapters import HTTPAdapter
+
+API_BASE = "https://api-v2.soundcloud.com"
+# /tracks?ids= принимает не больше 50 ID за запрос
+TRACKS_BATCH = 50
+
+# Ретраи: 429/5xx и обрывы соединения, Retry-After соблюдается, иначе экспонента с jitter
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Не больше стольких запросов к одному хосту одновременно (и столько же соединений в пуле)
+HOST_CONCURRENCY = 8
+
+_session = None
+_session_lock = threading.Lock()
+_host_limits: dict[str, threading.BoundedSemaphore] = {}
+
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HOST_CONCURRENCY)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def _host_limit(url):
+    host = urlparse(url).netloc
+    with _session_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(HOST_CONCURRENCY)
+        return _host_limits[host]
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(response, attempt):
+    backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    retry_after = _retry_after(response)
+    if retry_after is not None:
+        # Небольшой jitter, чтобы потоки не вернулись к серверу одновременно
+        return min(BACKOFF_MAX, retry_after) + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, backoff)
+
+
+def _api_get(url, params):
+    """GET через общий пул соединений с лимитом на хост и ретраями; возвращает JSON."""
+    session = _get_session()
+    limit = _host_limit(url)
+    for attempt in range(MAX_RETRIES + 1):
+        response = None
+        try:
+            with limit:
+                response = session.get(url, params=params, timeout=10)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == MAX_RETRIES:
+                raise
+        if response is not None and (response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES):
+            response.raise_for_status()
+            return response.json()
+        time.sleep(_retry_delay(response, attempt))
+
+
+def soundcloud_canonical_key(url):
+    """Канонический ключ ссылки: без схемы, www./m., query и хвостового слэша, в нижнем регистре."""
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return f"{host}{parsed.path.rstrip('/').lower()}"
+
 
 def resolve_soundcloud(url, client_id):
-    resolve_url = "https://api-v2.soundcloud.com/resolve"
+    resolve_url = f"{API_BASE}/resolve"
     params = {"url": url, "client_id": client_id}
-    r = requests.get(resolve_url, params=params, timeout=10)
-    r.raise_for_status()
-    return r.json()
+    return _api_get(resolve_url, params)
+
+
+def _is_stub(t):
+    # resolve заполняет только первые треки большого плейлиста, остальные — {"id", "kind", ...}
+    return t.get("id") is not None and t.get("title") is None
+
+
+def fetch_soundcloud_tracks(ids, client_id, workers=4):
+    """Полные объекты треков по ID: пачки по TRACKS_BATCH, не больше workers запросов одновременно."""
+    batches = [ids[i:i + TRACKS_BATCH] for i in range(0, len(ids), TRACKS_BATCH)]
+
+    def _batch(batch):
+        params = {"ids": ",".join(str(i) for i in batch), "client_id": client_id}
+        return _api_get(f"{API_BASE}/tracks", params)
+
+    tracks = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as pool:
+        for result in pool.map(_batch, batches):
+            for t in result or []:
+                tracks[t.get("id")] = t
+    return tracks
+
+
+def hydrate_soundcloud_tracks(tracks, client_id, workers=4):
+    """Заменить заглушки из resolve полными объектами; порядок сохраняется."""
+    stub_ids = list(dict.fromkeys(t["id"] for t in tracks if _is_stub(t)))
+    if not stub_ids:
+        return tracks
+    full = fetch_soundcloud_tracks(stub_ids, client_id, workers=workers)
+    return [full.get(t.get("id"), t) if _is_stub(t) else t for t in tracks]
+
 
-def parse_soundcloud_playlist(json_obj):
+def parse_soundcloud_playlist(json_obj, client_id=None, workers=4):
+    """С client_id треки-заглушки большого плейлиста догружаются через /tracks?ids=."""
     if json_obj.get("kind") == "playlist":
         title = json_obj.get("title")
+        raw_tracks = json_obj.get("tracks", [])
+        if client_id:
+            raw_tracks = hydrate_soundcloud_tracks(raw_tracks, client_id, workers=workers)
         tracks = []
-        for t in json_obj.get("tracks", []):
+        for t in raw_tracks:
             tracks.append({
                 "title": t.get("title"),
                 "artists": [t.get("user", {}).get("username")],
@@ -1,40 +1,151 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 from spotipy import Spotify
+from spotipy.cache_handler import MemoryCacheHandler
 from spotipy.oauth2 import SpotifyClientCredentials
 
-def get_spotify_client(client_id, client_secret):
-    auth = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
-    return Spotify(auth_manager=auth)
 
-def fetch_all_spotify_tracks(sp, playlist_id):
+class _SharedClientCredentials(SpotifyClientCredentials):
+    """Токен в памяти процесса; обновление под локом, чтобы потоки не запрашивали его разом.
+
+    spotipy считает токен истёкшим за 60 сек до expires_at — обновление заранее.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._token_lock = threading.Lock()
+
+    def get_access_token(self, as_dict=True, check_cache=True):
+        with self._token_lock:
+            return super().get_access_token(as_dict=as_dict, check_cache=check_cache)
+
+
+def build_http_session(pool_size=32, retries=3):
+    """requests.Session с keep-alive пулом на pool_size соединений и ретраями как у spotipy."""
+    session = requests.Session()
+    retry = urllib3.Retry(
+        total=retries,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+        status=retries,
+        backoff_factor=0.3,
+        status_forcelist=Spotify.default_retry_codes,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_spotify_client(client_id, client_secret, session=None):
+    """Spotify-клиент. С session токен хранится в памяти и соединения переиспользуются."""
+    if session is None:
+        auth = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
+        return Spotify(auth_manager=auth)
+    auth = _SharedClientCredentials(
+        client_id=client_id,
+        client_secret=client_secret,
+        requests_session=session,
+        cache_handler=MemoryCacheHandler(),
+    )
+    return Spotify(auth_manager=auth, requests_session=session)
+
+PAGE_LIMIT = 100
+# Проекции Spotify `fields`: ровно те ключи, из которых собираются треки
+TRACK_FIELDS = "name,artists(name),album(name),duration_ms,uri,id"
+PLAYLIST_ITEMS_FIELDS = f"items(track({TRACK_FIELDS})),next,total"
+# Для обновления по snapshot_id: ID плюс uri и name — локальные файлы ID не имеют
+PLAYLIST_IDS_FIELDS = "items(track(id,uri,name)),next,total"
+PLAYLIST_META_FIELDS = "name,owner(display_name),snapshot_id,tracks(total)"
+# sp.tracks принимает не больше 50 ID за запрос
+TRACKS_BATCH = 50
+
+
+def _track_from_item(item):
+    t = item.get("track") or {}
+    return {
+        "title": t.get("name"),
+        "artists": [a.get("name") for a in t.get("artists", [])],
+        "album": t.get("album", {}).get("name"),
+        "duration_ms": t.get("duration_ms"),
+        "spotify_uri": t.get("uri"),
+        "spotify_id": t.get("id")
+    }
+
+
+def fetch_all_spotify_tracks(sp, playlist_id, workers=1):
+    """Все треки плейлиста.
+
+    workers > 1 — первая страница берётся отдельно (из неё читается total),
+    остальные смещения загружаются параллельно; порядок треков сохраняется.
+    """
+    return _fetch_playlist_items(sp, playlist_id, PLAYLIST_ITEMS_FIELDS, _track_from_item, workers)
+
+
+def fetch_spotify_track_ids(sp, playlist_id, workers=1):
+    """Только ID треков плейлиста по порядку (None для локальных файлов)."""
+    return _fetch_playlist_items(
+        sp, playlist_id, PLAYLIST_IDS_FIELDS, lambda item: (item.get("track") or {}).get("id"), workers
+    )
+
+
+def _fetch_playlist_items(sp, playlist_id, fields, convert, workers):
+    if workers > 1:
+        return _fetch_playlist_items_concurrent(sp, playlist_id, fields, convert, workers)
+
     tracks = []
-    limit = 100
-    offset = 0
+    for page in _iter_playlist_pages(sp, playlist_id, fields, convert):
+        tracks.extend(page)
+    return tracks
+
+
+def _iter_playlist_pages(sp, playlist_id, fields, convert, offset=0):
+    """Страницы плейлиста по очереди, начиная с offset: список элементов на каждый запрос."""
+    limit = PAGE_LIMIT
 
     while True:
         response = sp.playlist_items(
             playlist_id,
+            fields=fields,
             limit=limit,
             offset=offset
         )
 
-        for item in response.get("items", []):
-            t = item.get("track") or {}
-            tracks.append({
-                "title": t.get("name"),
-                "artists": [a.get("name") for a in t.get("artists", [])],
-                "album": t.get("album", {}).get("name"),
-                "duration_ms": t.get("duration_ms"),
-                "spotify_uri": t.get("uri"),
-                "spotify_id": t.get("id")
-            })
+        yield [convert(item) for item in response.get("items", [])]
 
         if response.get("next") is None:
             break
 
         offset += limit
 
+
+def _fetch_playlist_items_concurrent(sp, playlist_id, fields, convert, workers):
+    limit = PAGE_LIMIT
+    first = sp.playlist_items(playlist_id, fields=fields, limit=limit, offset=0)
+    tracks = [convert(item) for item in first.get("items", [])]
+    if first.get("next") is None:
+        return tracks
+
+    total = first.get("total") or 0
+    offsets = range(limit, total, limit)
+
+    def _page(offset):
+        return sp.playlist_items(playlist_id, fields=fields, limit=limit, offset=offset)
+
+    # map() отдаёт результаты в порядке смещений, а не завершения запросов
+    with ThreadPoolExecutor(max_workers=min(workers, len(offsets) or 1)) as pool:
+        for response in pool.map(_page, offsets):
+            tracks.extend(convert(item) for item in response.get("items", []))
+
     return tracks
 
+
 def parse_spotify_track(sp, url_or_id):
     """Получить данные одного трека по URL или ID."""
     if "spotify" in str(url_or_id):
@@ -52,22 +163,101 @@ def parse_spotify_track(sp, url_or_id):
     }
 
 
-def parse_spotify_playlist(sp, url_or_id):
+def spotify_playlist_id(url_or_id):
+    """ID плейлиста из URL, URI (spotify:playlist:...) или самого ID."""
+    if url_or_id.startswith("spotify:"):
+        return url_or_id.split(":")[-1]
     if "spotify" in url_or_id:
-        playlist_id = url_or_id.rstrip('/').split("/")[-1].split("?")[0]
-    else:
-        playlist_id = url_or_id
+        return url_or_id.rstrip('/').split("/")[-1].split("?")[0]
+    return url_or_id
+
 
-    playlist = sp.playlist(playlist_id)
+def get_spotify_snapshot_id(sp, playlist_id):
+    """Только snapshot_id — крошечный запрос, чтобы понять, менялся ли плейлист."""
+    return sp.playlist(playlist_id, fields="snapshot_id").get("snapshot_id")
 
-    title = playlist.get("name")
-    owner = playlist.get("owner", {}).get("display_name")
 
-    tracks = fetch_all_spotify_tracks(sp, playlist_id)
+def get_spotify_playlist_meta(sp, playlist_id):
+    """Название, владелец и snapshot_id — без треков."""
+    # Без fields ответ содержит ещё и первые 100 треков целиком
+    return sp.playlist(playlist_id, fields=PLAYLIST_META_FIELDS)
 
+
+def spotify_playlist_header(playlist_id, meta):
+    """Поля результата parse_spotify_playlist без треков."""
     return {
         "source": "spotify",
-        "title": title,
-        "owner": owner,
-        "tracks": tracks
+        "playlist_id": playlist_id,
+        "title": meta.get("name"),
+        "owner": meta.get("owner", {}).get("display_name"),
+        "snapshot_id": meta.get("snapshot_id"),
     }
+
+
+def iter_spotify_track_pages(sp, playlist_id, offset=0):
+    """Треки плейлиста постранично (по PAGE_LIMIT), без накопления всего списка."""
+    return _iter_playlist_pages(sp, playlist_id, PLAYLIST_ITEMS_FIELDS, _track_from_item, offset=offset)
+
+
+def iter_spotify_tracks(sp, url_or_id, offset=0):
+    """Треки плейлиста по одному; следующая страница запрашивается, когда текущая прочитана.
+
+    offset — продолжить с трека с этим индексом (0-based).
+    """
+    playlist_id = spotify_playlist_id(url_or_id)
+    for page in iter_spotify_track_pages(sp, playlist_id, offset=offset):
+        yield from page
+
+
+async def aiter_spotify_tracks(sp, url_or_id, offset=0):
+    """Асинхронный вариант iter_spotify_tracks: запросы страниц идут в отдельном потоке."""
+    pages = iter_spotify_track_pages(sp, spotify_playlist_id(url_or_id), offset=offset)
+    while True:
+        page = await asyncio.to_thread(next, pages, None)
+        if page is None:
+            return
+        for track in page:
+            yield track
+
+
+def _playlist_result(playlist_id, playlist, tracks):
+    return {**spotify_playlist_header(playlist_id, playlist), "tracks": tracks}
+
+
+def parse_spotify_playlist(sp, url_or_id, workers=1):
+    playlist_id = spotify_playlist_id(url_or_id)
+    playlist = get_spotify_playlist_meta(sp, playlist_id)
+    tracks = fetch_all_spotify_tracks(sp, playlist_id, workers=workers)
+    return _playlist_result(playlist_id, playlist, tracks)
+
+
+def refresh_spotify_playlist(sp, url_or_id, previous, meta=None, workers=1):
+    """Обновить ранее сохранённый результат parse_spotify_playlist.
+
+    Совпал snapshot_id — возвращается previous без загрузки треков.
+    Иначе грузятся только ID, uri и названия треков, полные данные запрашиваются лишь для новых.
+    Возвращает (data, changed).
+    """
+    playlist_id = spotify_playlist_id(url_or_id)
+    playlist = meta or get_spotify_playlist_meta(sp, playlist_id)
+    if not previous:
+        return _playlist_result(playlist_id, playlist, fetch_all_spotify_tracks(sp, playlist_id, workers)), True
+    if previous.get("snapshot_id") and previous.get("snapshot_id") == playlist.get("snapshot_id"):
+        return previous, False
+
+    known = {t["spotify_id"]: t for t in previous.get("tracks", []) if t.get("spotify_id")}
+    # Локальные файлы без ID узнаются по uri, иначе теряли бы исполнителей и альбом
+    by_uri = {t["spotify_uri"]: t for t in previous.get("tracks", []) if t.get("spotify_uri")}
+    refs = _fetch_playlist_items(sp, playlist_id, PLAYLIST_IDS_FIELDS, lambda item: item.get("track") or {}, workers)
+    missing = list(dict.fromkeys(r["id"] for r in refs if r.get("id") and r["id"] not in known))
+    for start in range(0, len(missing), TRACKS_BATCH):
+        response = sp.tracks(missing[start:start + TRACKS_BATCH])
+        for t in response.get("tracks") or []:
+            if t:
+                known[t.get("id")] = _track_from_item({"track": t})
+
+    tracks = [
+        known.get(r.get("id")) or by_uri.get(r.get("uri")) or _track_from_item({"track": r})
+        for r in refs
+    ]
+    return _playlist_result(playlist_id, playlist, tracks), True
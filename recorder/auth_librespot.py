@@ -2,25 +2,29 @@
 """
 Однократная авторизация librespot (для Docker без host network).
 Сохраняет креды в .recorder_cache для последующих запусков.
+Для параллельной записи: auth_librespot.py N — аккаунт воркера N (.recorder_cache/workerN).
 """
 import subprocess
 import sys
 from pathlib import Path
 
 CACHE_DIR = Path(__file__).resolve().parent.parent / ".recorder_cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 def main():
+    worker = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    cache_dir = CACHE_DIR if worker <= 1 else CACHE_DIR / f"worker{worker}"
+    name = "RecordDevice" if worker <= 1 else f"RecordDevice{worker}"
+    cache_dir.mkdir(parents=True, exist_ok=True)
     print("Авторизация librespot. Открой URL в браузере, войди в Spotify,")
     print("скопируй ПОЛНЫЙ адрес после редиректа (http://127.0.0.1:...) и вставь сюда.\n")
     cmd = [
         "librespot",
-        "--name", "RecordDevice",
+        "--name", name,
         "--backend", "pipe",
         "--device", "/dev/null",
         "--enable-oauth",
         "--oauth-port", "0",
-        "--cache", str(CACHE_DIR),
+        "--cache", str(cache_dir),
     ]
     subprocess.run(cmd)
     return 0
@@ -0,0 +1,352 @@
+"""Захват звука с устройства librespot: по треку или непрерывным потоком на пачку треков."""
+import subprocess
+from pathlib import Path
+
+from .encode import Encoding, commit_partial, default_encoding, partial_path, stderr_tail
+from .librespot import LibrespotDevice
+from .ogg import OggPageScanner
+from .pcm import (
+    CHUNK_BYTES,
+    SAMPLE_RATE,
+    LeadTrimmer,
+    PcmSplitter,
+    drain_fifo,
+    expected_bytes,
+    ms_to_bytes,
+    open_fifo_reader,
+    peak,
+    wait_readable,
+)
+from .spotify_controller import pause_playback, play_track_on_device, play_tracks_on_device
+
+# Треков в одной очереди start_playback
+GAPLESS_BATCH = 50
+# Окно поиска тишины вокруг ожидаемой границы трека
+SPLIT_WINDOW_MS = 1500
+# Сколько ждать первых байт после start_playback и сколько терпеть паузу в потоке
+START_TIMEOUT = 30.0
+STALL_TIMEOUT = 30.0
+# Ручной запуск трека пользователем — ждать дольше
+MANUAL_START_TIMEOUT = 180.0
+# Длительность из API и реальный поток расходятся на миллисекунды: в последней секунде трека
+# пауза дольше TAIL_TIMEOUT считается концом трека, а недобор до TAIL_MS — не ошибкой
+TAIL_MS = 1000
+TAIL_TIMEOUT = 1.0
+
+
+def pump_pcm(
+    pipe_path: str,
+    encoder: subprocess.Popen,
+    expected: int,
+    start_timeout: float = START_TIMEOUT,
+) -> dict:
+    """Перекачать PCM из FIFO librespot в stdin энкодера ровно до expected байт.
+
+    Чтение — в один переиспользуемый буфер через memoryview, без копий на каждый кусок.
+    Тишина в начале отрезается, но идёт в счёт expected: pipe ничего не пишет до старта,
+    так что это вступление самого трека, и без учёта трек не дошёл бы до конца.
+    expected <= 0 — до конца потока.
+    Возвращает {"bytes", "trimmed", "peak", "stalled", "complete"}: stalled — данные
+    не пришли за start_timeout / STALL_TIMEOUT, complete — трек получен целиком.
+    """
+    stats = {"bytes": 0, "trimmed": 0, "peak": 0, "stalled": False, "complete": False}
+    reader = open_fifo_reader(pipe_path, start_timeout)
+    if reader is None:
+        stats["stalled"] = True
+        return stats
+    tail = ms_to_bytes(TAIL_MS)
+    lead = LeadTrimmer()
+    buf = bytearray(CHUNK_BYTES)
+    view = memoryview(buf)
+    try:
+        while expected <= 0 or stats["bytes"] + lead.trimmed < expected:
+            received = stats["bytes"] + lead.trimmed
+            in_tail = expected > 0 and received >= expected - tail
+            if not wait_readable(reader, TAIL_TIMEOUT if in_tail else STALL_TIMEOUT):
+                stats["stalled"] = not in_tail
+                break
+            want = CHUNK_BYTES if expected <= 0 else min(CHUNK_BYTES, expected - received)
+            n = reader.readinto(view[:want])
+            if not n:
+                break
+            chunk = lead.feed(view[:n])
+            if not chunk:
+                continue
+            try:
+                encoder.stdin.write(chunk)
+            except BrokenPipeError:
+                stats["stalled"] = True
+                break
+            stats["peak"] = max(stats["peak"], peak(chunk))
+            stats["bytes"] += len(chunk)
+    finally:
+        reader.close()
+    stats["trimmed"] = lead.trimmed
+    stats["complete"] = (
+        not stats["stalled"] and stats["bytes"] > 0 and stats["bytes"] + lead.trimmed >= expected - tail
+    )
+    return stats
+
+
+def pump_ogg(
+    pipe_path: str,
+    sink,
+    duration_ms: int,
+    start_timeout: float = START_TIMEOUT,
+) -> dict:
+    """Перекачать Ogg из FIFO librespot (--passthrough) в sink как есть, до конца трека.
+
+    Конец трека — страница с флагом EOS: она дописывается целиком, всё после неё отбрасывается.
+    Темп задаёт librespot (pipe не ждёт воспроизведения), своей задержки здесь нет.
+    Без EOS трек считается полным, если granule дошла до duration_ms за вычетом TAIL_MS.
+    Возвращает {"bytes", "granule", "pages", "eos", "stalled", "complete"}.
+    """
+    stats = {"bytes": 0, "granule": 0, "pages": 0, "eos": False, "stalled": False, "complete": False}
+    reader = open_fifo_reader(pipe_path, start_timeout)
+    if reader is None:
+        stats["stalled"] = True
+        return stats
+    expected = round((duration_ms or 0) * SAMPLE_RATE / 1000)
+    tail = TAIL_MS * SAMPLE_RATE // 1000
+    scanner = OggPageScanner()
+    buf = bytearray(CHUNK_BYTES)
+    view = memoryview(buf)
+    try:
+        while not scanner.eos:
+            in_tail = expected > 0 and scanner.granule >= expected - tail
+            if not wait_readable(reader, TAIL_TIMEOUT if in_tail else STALL_TIMEOUT):
+                stats["stalled"] = not in_tail
+                break
+            n = reader.readinto(buf)
+            if not n:
+                break
+            end = scanner.feed(view[:n])
+            chunk = view[:n if end is None else end]
+            try:
+                sink.stdin.write(chunk)
+            except BrokenPipeError:
+                stats["stalled"] = True
+                break
+            stats["bytes"] += len(chunk)
+    finally:
+        reader.close()
+    stats.update(granule=scanner.granule, pages=scanner.pages, eos=scanner.eos)
+    stats["complete"] = not stats["stalled"] and stats["bytes"] > 0 and (
+        scanner.eos or scanner.granule >= expected - tail
+    )
+    return stats
+
+
+def pump_track(
+    pipe_path: str,
+    encoder,
+    duration_ms: int,
+    encoding: Encoding,
+    start_timeout: float = START_TIMEOUT,
+) -> dict:
+    """pump_ogg для passthrough, иначе pump_pcm."""
+    if encoding.passthrough:
+        return pump_ogg(pipe_path, encoder, duration_ms, start_timeout)
+    return pump_pcm(pipe_path, encoder, expected_bytes(duration_ms), start_timeout)
+
+
+def capture_track(
+    device: LibrespotDevice,
+    sp,
+    track: dict,
+    output_path: Path,
+    encoding: Encoding | None = None,
+) -> bool:
+    """Записать один трек на устройстве device (librespot запускается при необходимости).
+
+    output_path — файл захвата (encoding.capture_path); пишется под временным именем
+    (partial_path) и появляется только целиком. Без глобального лога (в консоль — только
+    ошибки ffmpeg) — безопасно вызывать из нескольких потоков, каждый со своим устройством.
+    """
+    encoding = encoding or default_encoding()
+    device.ensure_running()
+    device_id = device.find_device_id(sp)
+    if not device_id:
+        return False
+    output_path = Path(output_path)
+    encoder = encoding.start(partial_path(output_path))
+    stats = {"complete": False}
+    # Хвост прошлого трека, оставшийся в pipe, не должен стать началом этого
+    drain_fifo(device.pipe_path)
+    try:
+        if play_track_on_device(sp, track.get("spotify_uri"), device_id):
+            stats = pump_track(device.pipe_path, encoder, track.get("duration_ms"), encoding)
+    finally:
+        # librespot не должен писать в FIFO, пока его никто не читает
+        pause_playback(sp, device_id)
+        encoded = finish_encoder(encoder)
+    if not encoded:
+        _print_encoder_errors(encoder, output_path)
+    if not encoded or not stats["complete"]:
+        partial_path(output_path).unlink(missing_ok=True)
+        return False
+    return commit_partial(output_path)
+
+
+def finish_encoder(proc: subprocess.Popen, timeout: float = 60) -> bool:
+    try:
+        proc.stdin.close()
+    except OSError:
+        pass
+    try:
+        return proc.wait(timeout=timeout) == 0
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        return False
+
+
+def _print_encoder_errors(proc, path: Path):
+    """Хвост stderr упавшего энкодера: без него неверный кодек или аргумент не видно."""
+    for line in stderr_tail(proc):
+        print(f"  ffmpeg ({path.name}): {line}", flush=True)
+
+
+def _drop_skipped(plan: list[dict], splitter: PcmSplitter, loaded: list[str]) -> list[dict]:
+    """Убрать из плана треки, которые librespot пропустил (недоступны в регионе и т.п.).
+
+    loaded — URI в порядке загрузки. Если следующий загруженный URI встречается в плане дальше,
+    всё между ними пропущено. Незнакомый URI (relink) считается текущим треком плана.
+    Возвращает выкинутые записи плана.
+    """
+    dropped: list[dict] = []
+    i = 0
+    for uri in loaded:
+        if i >= len(plan):
+            break
+        if plan[i]["uri"] == uri:
+            i += 1
+            continue
+        later = next((k for k in range(i + 1, len(plan)) if plan[k]["uri"] == uri), None)
+        if later is None:
+            i += 1
+            continue
+        # Выкидывать можно только то, во что ещё не записано ни байта
+        first_free = splitter.current + (1 if splitter.written else 0)
+        if i < first_free:
+            break
+        dropped.extend(plan[i:later])
+        del plan[i:later]
+        del splitter.lengths[i:later]
+        i += 1
+    return dropped
+
+
+def record_batch_continuous(
+    device: LibrespotDevice,
+    sp,
+    batch: list[tuple[int, dict, Path]],
+    on_status=None,
+    encoding: Encoding | None = None,
+) -> list[Path]:
+    """Записать пачку треков одним непрерывным потоком.
+
+    batch — (номер в плейлисте, трек, файл захвата). on_status(номер, трек, статус):
+    recording | ok | error. Возвращает успешно записанные пути.
+    Только для PCM: passthrough пишется по треку (см. run_record_playlist).
+    """
+    encoding = encoding or default_encoding()
+    def _status(entry: dict, status: str):
+        if on_status:
+            on_status(entry["i"], entry["track"], status)
+
+    plan = [
+        {
+            "i": i,
+            "track": t,
+            "path": Path(p),
+            "uri": t.get("spotify_uri"),
+            "expected": expected_bytes(t.get("duration_ms")),
+            "bytes": 0,
+        }
+        for i, t, p in batch
+    ]
+    device.ensure_running()
+    device_id = device.find_device_id(sp)
+    if not device_id:
+        for entry in plan:
+            _status(entry, "error")
+        return []
+
+    window = ms_to_bytes(SPLIT_WINDOW_MS)
+    splitter = PcmSplitter([e["expected"] for e in plan], window)
+    loaded_mark = device.loaded_count()
+    encoders: dict[int, subprocess.Popen] = {}
+    done: list[Path] = []
+    finished = 0  # позиций плана, чьи энкодеры уже закрыты
+
+    def _close_until(position: int):
+        nonlocal finished
+        while finished < position and finished < len(plan):
+            entry = plan[finished]
+            proc = encoders.pop(id(entry), None)
+            # Трек, оборванный раньше ожидаемой длины (с учётом окна разреза), не считается записанным
+            complete = entry["bytes"] >= entry["expected"] - window
+            encoded = proc is not None and finish_encoder(proc)
+            if proc is not None and not encoded:
+                _print_encoder_errors(proc, entry["path"])
+            if encoded and complete and commit_partial(entry["path"]):
+                done.append(entry["path"])
+                _status(entry, "ok")
+            else:
+                partial_path(entry["path"]).unlink(missing_ok=True)
+                _status(entry, "error")
+            finished += 1
+
+    def _write(position: int, data: bytes):
+        _close_until(position)
+        entry = plan[position]
+        proc = encoders.get(id(entry))
+        if proc is None:
+            proc = encoders[id(entry)] = encoding.start(partial_path(entry["path"]))
+            _status(entry, "recording")
+        proc.stdin.write(data)
+        entry["bytes"] += len(data)
+
+    drain_fifo(device.pipe_path)
+    if not play_tracks_on_device(sp, [e["uri"] for e in plan], device_id):
+        for entry in plan:
+            _status(entry, "error")
+        return []
+
+    reader = open_fifo_reader(device.pipe_path, START_TIMEOUT)
+    try:
+        if reader is not None:
+            buf = bytearray(CHUNK_BYTES)
+            view = memoryview(buf)
+            # Тишина в начале пачки — вступление первого трека: отрезается, и на столько же
+            # короче ожидаемая длина этого трека, иначе все границы сдвинутся позже
+            lead = LeadTrimmer()
+            while wait_readable(reader, STALL_TIMEOUT):
+                n = reader.readinto(buf)
+                if not n:
+                    break
+                for entry in _drop_skipped(plan, splitter, device.loaded_uris(since=loaded_mark)):
+                    _status(entry, "error")
+                trimming = not lead.done
+                data = lead.feed(view[:n])
+                if trimming and lead.done and lead.trimmed and plan:
+                    splitter.lengths[0] = max(0, splitter.lengths[0] - lead.trimmed)
+                    plan[0]["expected"] = splitter.lengths[0]
+                for position, data in splitter.feed(data):
+                    _write(position, data)
+            for position, data in splitter.finish():
+                _write(position, data)
+            _close_until(splitter.current + 1)
+    finally:
+        if reader is not None:
+            reader.close()
+        # Оборванный поток: незаконченные треки — ошибка, частичные файлы удаляются
+        for entry in plan[finished:]:
+            proc = encoders.pop(id(entry), None)
+            if proc is not None:
+                proc.kill()
+                proc.wait()
+                partial_path(entry["path"]).unlink(missing_ok=True)
+            _status(entry, "error")
+        pause_playback(sp, device_id)
+    return done
@@ -7,6 +7,8 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 PARSE_JSON_PATH = PROJECT_ROOT / "parse.json"
 RECORDINGS_DIR = PROJECT_ROOT / "recordings"
 CACHE_DIR = PROJECT_ROOT / ".recorder_cache"
+# Очередь заданий веб-интерфейса (recorder/jobs.py)
+JOBS_DB = RECORDINGS_DIR / "jobs.sqlite3"
 
 LIBRESPOT_CMD = os.getenv("LIBRESPOT_CMD", "librespot")
 FFMPEG_CMD = os.getenv("FFMPEG_CMD", "ffmpeg")
@@ -15,12 +17,33 @@ FFMPEG_CMD = os.getenv("FFMPEG_CMD", "ffmpeg")
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI", "http://127.0.0.1:8888/callback")
+# Параллельная загрузка страниц плейлиста (1 — последовательно)
+SPOTIFY_FETCH_WORKERS = int(os.getenv("SPOTIFY_FETCH_WORKERS", "4"))
 
+# Имя устройства Spotify Connect, под которым librespot виден в Web API
+DEVICE_NAME = os.getenv("RECORD_DEVICE_NAME", "RecordDevice")
+# Параллельная запись: столько librespot-устройств пишут треки одновременно.
+# Аккаунт Spotify играет только на одном устройстве за раз, поэтому у каждого воркера свой аккаунт:
+# кэш librespot и OAuth-токен воркера N (N ≥ 2) лежат в CACHE_DIR/workerN (авторизация: --auth --worker N).
+RECORD_WORKERS = max(1, int(os.getenv("RECORD_WORKERS", "1")))
+# Формат записей (mp3 | opus | aac | flac | wav | ogg — родной поток librespot без перекодирования)
+# и битрейт; пусто — битрейт формата по умолчанию
+RECORD_FORMAT = os.getenv("RECORD_FORMAT", "mp3")
+RECORD_BITRATE = os.getenv("RECORD_BITRATE") or None
+# Захват без потерь (flac | wav | raw) и перекодирование отдельно, ENCODE_WORKERS ffmpeg одновременно
+RECORD_INTERMEDIATE = os.getenv("RECORD_INTERMEDIATE") or None
+RECORD_KEEP_INTERMEDIATE = os.getenv("RECORD_KEEP_INTERMEDIATE") == "1"
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "0")) or os.cpu_count() or 1
 
-if os.name == "nt":
-    PIPE_PATH = None
-else:
-    PIPE_PATH = "/tmp/spotify_record_fifo"
+
+def worker_config(n: int) -> dict:
+    """Устройство воркера n (0-based): имя и каталог кэша. Воркер 0 — прежние настройки.
+
+    FIFO у воркеров свои на каждую сессию записи (recorder/fifo.py).
+    """
+    if n == 0:
+        return {"name": DEVICE_NAME, "cache_dir": CACHE_DIR}
+    return {"name": f"{DEVICE_NAME}{n + 1}", "cache_dir": CACHE_DIR / f"worker{n + 1}"}
 
 
 def load_parse_json(path: Path | None = None) -> dict:
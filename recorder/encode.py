@@ -0,0 +1,252 @@
+"""Кодирование записанного PCM: формат результата и офлайн-перекодирование из lossless."""
+import os
+import re
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from .config import (
+    ENCODE_WORKERS,
+    FFMPEG_CMD,
+    RECORD_BITRATE,
+    RECORD_FORMAT,
+    RECORD_INTERMEDIATE,
+    RECORD_KEEP_INTERMEDIATE,
+)
+from .pcm import CHANNELS, SAMPLE_RATE
+
+# Формат результата: расширение, кодек ffmpeg, битрейт по умолчанию (None — без потерь)
+FORMATS = {
+    "mp3": {"ext": ".mp3", "codec": "libmp3lame", "bitrate": "320k", "mime": "audio/mpeg"},
+    "opus": {"ext": ".opus", "codec": "libopus", "bitrate": "160k", "mime": "audio/ogg"},
+    "aac": {"ext": ".m4a", "codec": "aac", "bitrate": "256k", "mime": "audio/mp4"},
+    "flac": {"ext": ".flac", "codec": "flac", "bitrate": None, "mime": "audio/flac"},
+    "wav": {"ext": ".wav", "codec": "pcm_s16le", "bitrate": None, "mime": "audio/wav"},
+    # Родной Ogg Vorbis из librespot --passthrough: сохраняется как есть, без декодирования и ffmpeg
+    "ogg": {"ext": ".ogg", "codec": None, "bitrate": None, "mime": "audio/ogg", "passthrough": True},
+}
+# Промежуточный файл захвата: raw — сырой PCM без ffmpeg вовсе
+INTERMEDIATES = {"flac": ".flac", "wav": ".wav", "raw": ".pcm"}
+AUDIO_EXTENSIONS = frozenset(f["ext"] for f in FORMATS.values())
+MEDIA_TYPES = {f["ext"]: f["mime"] for f in FORMATS.values()}
+# Промежуточные файлы лежат в подпапке выходной папки и в списки записей не попадают
+INTERMEDIATE_DIR = ".lossless"
+# Недописанные файлы: <INTERMEDIATE_DIR>/<имя>.part<расширение>, на место — только os.replace
+PART_SUFFIX = ".part"
+
+_PCM_INPUT = ["-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS)]
+# Сколько последних строк stderr ffmpeg хранить для диагностики
+STDERR_TAIL = 20
+
+
+def partial_path(path: Path) -> Path:
+    """Временное имя для path: в INTERMEDIATE_DIR, поэтому в списки записей не попадает."""
+    path = Path(path)
+    folder = path.parent if path.parent.name == INTERMEDIATE_DIR else path.parent / INTERMEDIATE_DIR
+    return folder / (path.stem + PART_SUFFIX + path.suffix)
+
+
+def commit_partial(path: Path) -> bool:
+    """Переименовать partial_path(path) в path. False — временного файла нет."""
+    try:
+        os.replace(partial_path(path), path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _start_ffmpeg(cmd: list[str], stdin) -> subprocess.Popen:
+    """ffmpeg со stderr, который читается в фоне (буфер пайпа не заполнится); хвост — в stderr_tail()."""
+    proc = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    proc.stderr_lines = deque(maxlen=STDERR_TAIL)
+    proc.stderr_reader = threading.Thread(target=_read_stderr, args=(proc,), daemon=True)
+    proc.stderr_reader.start()
+    return proc
+
+
+def _read_stderr(proc: subprocess.Popen):
+    for raw in proc.stderr:
+        line = raw.decode(errors="replace").rstrip()
+        if line:
+            proc.stderr_lines.append(line)
+
+
+def stderr_tail(proc, lines: int = 10) -> list[str]:
+    """Последние строки stderr энкодера после его завершения (у _RawSink их нет)."""
+    reader = getattr(proc, "stderr_reader", None)
+    if reader is not None:
+        reader.join(timeout=1)
+    return list(getattr(proc, "stderr_lines", ()))[-lines:]
+
+
+def _codec_args(fmt: str, bitrate: str | None) -> list[str]:
+    spec = FORMATS[fmt]
+    args = ["-c:a", spec["codec"]]
+    bitrate = bitrate or spec["bitrate"]
+    if bitrate and spec["bitrate"]:
+        args += ["-b:a", bitrate]
+    return args
+
+
+class _RawSink:
+    """Запись потока (сырой PCM или Ogg) прямо в файл — тот же интерфейс, что у Popen энкодера (stdin, wait, kill)."""
+
+    def __init__(self, path: Path):
+        self.stdin = open(path, "wb")
+
+    def wait(self, timeout: float | None = None) -> int:
+        self.stdin.close()
+        return 0
+
+    def kill(self):
+        self.stdin.close()
+
+
+class Encoding:
+    """Во что превращается захваченный PCM.
+
+    Без intermediate ffmpeg кодирует в fmt прямо во время захвата. С intermediate
+    (flac | wav | raw) захват пишется без потерь в INTERMEDIATE_DIR, а в fmt его
+    перекодирует EncodePool — кодер не конкурирует с захватом в реальном времени.
+    Формат passthrough (ogg) захватывается из librespot без декодирования — intermediate не нужен.
+    """
+
+    def __init__(
+        self,
+        fmt: str = "mp3",
+        bitrate: str | None = None,
+        intermediate: str | None = None,
+        keep_intermediate: bool = False,
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат: {fmt} (есть: {', '.join(FORMATS)})")
+        if intermediate and intermediate not in INTERMEDIATES:
+            raise ValueError(f"Неизвестный промежуточный формат: {intermediate} (есть: {', '.join(INTERMEDIATES)})")
+        if bitrate and not re.fullmatch(r"\d+k?", bitrate):
+            raise ValueError(f"Неверный битрейт: {bitrate} (например, 320k)")
+        self.fmt = fmt
+        self.bitrate = bitrate
+        # Захват сразу в тот же lossless-формат — перекодировать нечего
+        self.intermediate = None if intermediate == fmt or FORMATS[fmt].get("passthrough") else intermediate
+        self.keep_intermediate = keep_intermediate
+
+    @property
+    def passthrough(self) -> bool:
+        """Захват родного потока librespot (--passthrough) вместо PCM."""
+        return bool(FORMATS[self.fmt].get("passthrough"))
+
+    @property
+    def ext(self) -> str:
+        return FORMATS[self.fmt]["ext"]
+
+    def capture_path(self, output_path: Path) -> Path:
+        """Куда пишет захват: сам output_path или промежуточный файл рядом."""
+        output_path = Path(output_path)
+        if not self.intermediate:
+            return output_path
+        return output_path.parent / INTERMEDIATE_DIR / (output_path.stem + INTERMEDIATES[self.intermediate])
+
+    def start(self, path: Path):
+        """Энкодер захвата: принимает PCM (или Ogg для passthrough) в stdin и пишет path."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self.intermediate == "raw" or self.passthrough:
+            return _RawSink(path)
+        codec = _codec_args(self.intermediate, None) if self.intermediate else _codec_args(self.fmt, self.bitrate)
+        cmd = [FFMPEG_CMD, "-y", "-loglevel", "error", *_PCM_INPUT, "-i", "pipe:0", *codec, str(path)]
+        return _start_ffmpeg(cmd, subprocess.PIPE)
+
+
+def default_encoding() -> Encoding:
+    """Encoding из настроек RECORD_* в .env."""
+    return Encoding(RECORD_FORMAT, RECORD_BITRATE, RECORD_INTERMEDIATE, RECORD_KEEP_INTERMEDIATE)
+
+
+def transcode(source: Path, output_path: Path, fmt: str, bitrate: str | None = None) -> bool:
+    """Перекодировать lossless-файл (flac, wav или сырой .pcm) в fmt. Результат пишется атомарно.
+
+    При ошибке хвост stderr ffmpeg печатается в консоль.
+    """
+    source, output_path = Path(source), Path(output_path)
+    input_args = _PCM_INPUT if source.suffix == INTERMEDIATES["raw"] else []
+    # Недописанный файл не должен попасть в список записей
+    tmp_path = partial_path(output_path)
+    tmp_path.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        FFMPEG_CMD, "-y", "-loglevel", "error",
+        *input_args, "-i", str(source),
+        *_codec_args(fmt, bitrate),
+        str(tmp_path),
+    ]
+    proc = _start_ffmpeg(cmd, subprocess.DEVNULL)
+    # Офлайн-кодирование не должно отнимать процессор у захвата
+    if hasattr(os, "setpriority"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, proc.pid, 10)
+        except OSError:
+            pass
+    if proc.wait() != 0 or not tmp_path.exists():
+        tmp_path.unlink(missing_ok=True)
+        print(f"[!] Ошибка кодирования {source.name} в {fmt}", flush=True)
+        for line in stderr_tail(proc):
+            print(f"  ffmpeg: {line}", flush=True)
+        return False
+    os.replace(tmp_path, output_path)
+    return True
+
+
+class EncodePool:
+    """Параллельное перекодирование промежуточных файлов, не больше workers ffmpeg одновременно.
+
+    Каждый кодер — отдельный процесс ffmpeg с пониженным приоритетом; потоки пула только
+    ограничивают их число (по умолчанию — по числу ядер).
+    """
+
+    def __init__(self, encoding: Encoding, workers: int | None = None):
+        self.encoding = encoding
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers or ENCODE_WORKERS))
+
+    def submit(self, source: Path, output_path: Path, on_done=None) -> Future:
+        """Поставить перекодирование в очередь; on_done(ok) вызывается из потока пула всегда, и при ошибке."""
+        def _run() -> bool:
+            try:
+                ok = transcode(source, output_path, self.encoding.fmt, self.encoding.bitrate)
+            except Exception as e:
+                # Future проглотил бы исключение, а трек так и остался бы недописанным
+                print(f"[!] Ошибка кодирования {Path(source).name}: {e}", flush=True)
+                ok = False
+            if ok and not self.encoding.keep_intermediate:
+                Path(source).unlink(missing_ok=True)
+            if on_done:
+                on_done(ok)
+            return ok
+
+        return self._pool.submit(_run)
+
+    def close(self):
+        """Дождаться всех перекодирований."""
+        self._pool.shutdown(wait=True)
+
+
+def reencode_folder(folder: Path, encoding: Encoding, workers: int | None = None) -> list[Path]:
+    """Перекодировать сохранённые промежуточные файлы папки плейлиста в encoding.fmt без перезаписи.
+
+    Passthrough-формат (ogg) из PCM не получить — ValueError.
+    """
+    if encoding.passthrough:
+        raise ValueError(f"{encoding.fmt} пишется только захватом из librespot, перекодировать в него нельзя")
+    folder = Path(folder)
+    sources = sorted(
+        p for p in (folder / INTERMEDIATE_DIR).glob("*")
+        if p.suffix in INTERMEDIATES.values() and not p.stem.endswith(PART_SUFFIX)
+    )
+    done: list[Path] = []
+    keep = Encoding(encoding.fmt, encoding.bitrate, keep_intermediate=True)
+    pool = EncodePool(keep, workers)
+    for source in sources:
+        output_path = folder / (source.stem + encoding.ext)
+        pool.submit(source, output_path, on_done=lambda ok, p=output_path: ok and done.append(p))
+    pool.close()
+    return done
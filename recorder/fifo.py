@@ -0,0 +1,97 @@
+"""Именованные каналы для pipe-бэкенда librespot: свои на каждую сессию записи."""
+import atexit
+import os
+import stat
+import tempfile
+import threading
+from pathlib import Path
+
+# Каталоги сессий: <tmp>/spotify_record_<pid>_<случайное>
+FIFO_DIR_PREFIX = "spotify_record_"
+
+_live: set["FifoSession"] = set()
+_live_lock = threading.Lock()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # процесс есть, но чужой
+    return True
+
+
+def _remove_dir(path: Path):
+    """Удалить каталог сессии: только FIFO внутри, обычные файлы не трогаются."""
+    try:
+        for entry in path.iterdir():
+            if stat.S_ISFIFO(entry.lstat().st_mode):
+                entry.unlink(missing_ok=True)
+        path.rmdir()
+    except OSError:
+        pass
+
+
+def sweep_stale_sessions(tmp_dir: str | None = None):
+    """Убрать каталоги сессий, оставшиеся от упавших процессов (PID из имени уже не существует)."""
+    base = Path(tmp_dir or tempfile.gettempdir())
+    for path in base.glob(f"{FIFO_DIR_PREFIX}*"):
+        pid = path.name[len(FIFO_DIR_PREFIX):].split("_", 1)[0]
+        if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)) and path.is_dir():
+            _remove_dir(path)
+
+
+class FifoSession:
+    """Приватный каталог (mkdtemp, права 0700) с FIFO одной сессии записи.
+
+    create(name) выдаёт уникальный канал, close() удаляет всё. Незакрытые сессии удаляются
+    при выходе процесса (atexit), а после SIGKILL — при следующем запуске (sweep_stale_sessions).
+    """
+
+    def __init__(self, tmp_dir: str | None = None):
+        self._tmp_dir = tmp_dir
+        self.path: Path | None = None
+        self._fifos: list[str] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def create(self, name: str = "audio") -> str | None:
+        """Создать FIFO name в каталоге сессии. None — mkfifo недоступен (Windows без WSL)."""
+        if not hasattr(os, "mkfifo"):
+            return None
+        if self.path is None:
+            sweep_stale_sessions(self._tmp_dir)
+            self.path = Path(tempfile.mkdtemp(prefix=f"{FIFO_DIR_PREFIX}{os.getpid()}_", dir=self._tmp_dir))
+            with _live_lock:
+                _live.add(self)
+        fifo_path = str(self.path / f"{name}.fifo")
+        if fifo_path in self._fifos:
+            return fifo_path
+        try:
+            os.mkfifo(fifo_path, 0o600)
+        except OSError:
+            return None
+        self._fifos.append(fifo_path)
+        return fifo_path
+
+    def close(self):
+        path, self.path = self.path, None
+        self._fifos = []
+        with _live_lock:
+            _live.discard(self)
+        if path is not None:
+            _remove_dir(path)
+
+
+@atexit.register
+def _close_all():
+    with _live_lock:
+        sessions = list(_live)
+    for session in sessions:
+        session.close()
@@ -0,0 +1,170 @@
+"""Очередь заданий записи для веб-интерфейса: SQLite в recordings/, переживает перезапуск."""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .config import JOBS_DB
+
+# Состояния задания
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+CANCELLED = "cancelled"
+FINISHED = (DONE, ERROR, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    current INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    track TEXT NOT NULL DEFAULT '',
+    artists TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (state, priority DESC, id);
+"""
+# Поля прогресса, которые можно менять через update()
+_PROGRESS_FIELDS = ("current", "total", "track", "artists", "status")
+
+
+def _row(row: sqlite3.Row | None) -> dict | None:
+    if row is None:
+        return None
+    job = dict(row)
+    job["params"] = json.loads(job["params"] or "{}")
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+class JobQueue:
+    """Задания записи: track | playlist, источник (URL или путь к playlist.json) и параметры.
+
+    Следующим берётся queued с наибольшим priority, при равенстве — самое старое.
+    Одно соединение на процесс под блокировкой; WAL, чтобы чтение списка не ждало записи.
+    Задания, которые выполнялись при падении процесса, при открытии снова ставятся в очередь:
+    журнал папки плейлиста не даст перезаписать уже готовые треки.
+    """
+
+    def __init__(self, path: Path = JOBS_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, started = NULL WHERE state = ?", (QUEUED, RUNNING)
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def submit(self, kind: str, source: str, params: dict | None = None, priority: int = 0) -> dict:
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT INTO jobs (kind, source, params, priority, created) VALUES (?, ?, ?, ?, ?)",
+                (kind, source, json.dumps(params or {}, ensure_ascii=False), priority, time.time()),
+            )
+            return _row(self._db.execute("SELECT * FROM jobs WHERE id = ?", (cur.lastrowid,)).fetchone())
+
+    def get(self, job_id: int) -> dict | None:
+        with self._lock:
+            return _row(self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list(self, state: str | None = None, limit: int = 50, offset: int = 0) -> list[dict]:
+        """Сначала активные (по порядку выполнения), затем завершённые — новые выше."""
+        query = "SELECT * FROM jobs"
+        args: list = []
+        if state:
+            query += " WHERE state = ?"
+            args.append(state)
+        query += (
+            " ORDER BY CASE state WHEN 'running' THEN 0 WHEN 'queued' THEN 1 ELSE 2 END,"
+            " CASE WHEN state = 'queued' THEN -priority ELSE 0 END,"
+            " CASE WHEN state IN ('running', 'queued') THEN id ELSE -id END"
+            " LIMIT ? OFFSET ?"
+        )
+        args += [limit, offset]
+        with self._lock:
+            return [_row(r) for r in self._db.execute(query, args).fetchall()]
+
+    def active(self) -> dict | None:
+        """Выполняемое сейчас задание."""
+        with self._lock:
+            return _row(self._db.execute(
+                "SELECT * FROM jobs WHERE state = ? ORDER BY started LIMIT 1", (RUNNING,)
+            ).fetchone())
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchone()[0]
+
+    def claim(self) -> dict | None:
+        """Взять следующее задание из очереди и пометить running."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE state = ? ORDER BY priority DESC, id LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                self._db.execute(
+                    "UPDATE jobs SET state = ?, started = ? WHERE id = ?", (RUNNING, time.time(), row["id"])
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            return _row(self._db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def update(self, job_id: int, **progress):
+        fields = {k: v for k, v in progress.items() if k in _PROGRESS_FIELDS}
+        if not fields:
+            return
+        sets = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {sets} WHERE id = ?", (*fields.values(), job_id))
+
+    def finish(self, job_id: int, state: str, error: str | None = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, error = ?, finished = ? WHERE id = ?",
+                (state, error, time.time(), job_id),
+            )
+
+    def cancel(self, job_id: int) -> dict | None:
+        """Отменить задание: из очереди — сразу, выполняемое — по флагу cancel_requested."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, finished = ? WHERE id = ? AND state = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            self._db.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state = ?", (job_id, RUNNING)
+            )
+            return _row(self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def set_priority(self, job_id: int, priority: int) -> dict | None:
+        with self._lock:
+            self._db.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, job_id))
+            return _row(self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
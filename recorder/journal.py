@@ -0,0 +1,95 @@
+"""Журнал записи плейлиста: append-only JSONL в папке плейлиста, ключ — spotify_id трека."""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+JOURNAL_NAME = "journal.jsonl"
+# Состояния трека: начат, записан целиком (файл на месте), ошибка
+RECORDING = "recording"
+DONE = "done"
+ERROR = "error"
+# Журнал переписывается начисто, когда устаревших строк больше, чем актуальных, в столько раз
+COMPACT_RATIO = 4
+
+
+def track_key(track: dict) -> str | None:
+    return track.get("spotify_id") or track.get("spotify_uri")
+
+
+class RecordJournal:
+    """Состояние треков папки плейлиста без сканирования файлов.
+
+    Каждое изменение — одна строка JSON, дописанная в конец с fsync; последняя строка
+    для spotify_id главнее предыдущих. Оборванная при падении строка при чтении пропускается.
+    Трек считается записанным, только если последняя запись — done с тем же именем файла:
+    файлы пишутся под временным именем и переименовываются лишь после успешного завершения.
+    """
+
+    def __init__(self, folder: Path):
+        self.path = Path(folder) / JOURNAL_NAME
+        self.entries: dict[str, dict] = {}
+        self.existed = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        self.existed = True
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get("id"):
+                self.entries[entry["id"]] = entry
+        if len(lines) > COMPACT_RATIO * max(1, len(self.entries)):
+            self._compact()
+
+    def _compact(self):
+        """Переписать журнал по одной строке на трек: временный файл и атомарное переименование."""
+        tmp_path = self.path.with_suffix(".jsonl.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, track: dict, filename: str) -> bool:
+        entry = self.entries.get(track_key(track) or "")
+        return bool(entry) and entry.get("state") == DONE and entry.get("file") == filename
+
+    def record(self, track: dict, state: str, path: Path | None = None):
+        """Дописать состояние трека. Для done размер берётся из готового файла path."""
+        key = track_key(track)
+        if not key:
+            return
+        entry = {"id": key, "state": state, "duration_ms": track.get("duration_ms"), "ts": int(time.time())}
+        if path is not None:
+            path = Path(path)
+            entry["file"] = path.name
+            if state == DONE:
+                try:
+                    entry["bytes"] = path.stat().st_size
+                except OSError:
+                    return
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a+b") as f:
+                # Хвост, оборванный прошлым падением, не должен склеиться с новой строкой
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                f.write(line.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            self.existed = True
+            self.entries[key] = entry
@@ -0,0 +1,155 @@
+"""Индекс записей в RECORDINGS_DIR: папки, треки, размеры и длительности без обхода диска на каждый запрос."""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from .config import RECORDINGS_DIR
+from .encode import AUDIO_EXTENSIONS
+from .journal import DONE, JOURNAL_NAME
+
+# Чаще этого mtime каталогов не перепроверяются (invalidate() снимает ограничение)
+RECHECK_INTERVAL = 2.0
+
+
+def _mtime_ns(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _folder_stamp(path: Path) -> tuple | None:
+    """Отметка папки: mtime каталога плюс mtime и размер журнала.
+
+    Дописывание в journal.jsonl не меняет mtime каталога, а длительности берутся из журнала.
+    """
+    dir_mtime = _mtime_ns(path)
+    if dir_mtime is None:
+        return None
+    try:
+        st = (path / JOURNAL_NAME).stat()
+        journal = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        journal = None
+    return dir_mtime, journal
+
+
+def _durations(folder: Path) -> dict[str, int]:
+    """Длительности из журнала записи папки: имя файла → duration_ms."""
+    durations: dict[str, int] = {}
+    try:
+        with open(folder / JOURNAL_NAME, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and entry.get("state") == DONE and entry.get("file"):
+                    durations[entry["file"]] = entry.get("duration_ms")
+    except OSError:
+        pass
+    return durations
+
+
+class RecordingsIndex:
+    """Папки и файлы записей в памяти.
+
+    refresh() сверяет mtime корня и каждой папки (и её журнала) и пересканирует только изменившиеся:
+    файлы появляются через os.replace и удаляются, оба действия меняют mtime каталога,
+    а длительности приходят строками журнала.
+    generation растёт при каждом изменении — из него строится ETag ответов.
+    """
+
+    def __init__(self, root: Path = RECORDINGS_DIR):
+        self.root = Path(root)
+        self.generation = 0
+        # Уникален для процесса: ETag после перезапуска не совпадёт со старым
+        self.epoch = f"{os.getpid():x}{time.time_ns():x}"
+        self._root_mtime: int | None = None
+        self._folder_names: list[str] = []
+        self._folders: dict[str, dict] = {}
+        self._root_files: list[dict] = []
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Проверить mtime при следующем обращении, не дожидаясь RECHECK_INTERVAL."""
+        self._checked = 0.0
+
+    def refresh(self, force: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._checked < RECHECK_INTERVAL:
+                return
+            self._checked = now
+            changed = False
+            root_mtime = _mtime_ns(self.root)
+            if root_mtime != self._root_mtime:
+                self._root_mtime = root_mtime
+                self._rescan_root()
+                changed = True
+            for name in self._folder_names:
+                folder = self._folders[name]
+                stamp = _folder_stamp(self.root / name)
+                if stamp != folder["stamp"]:
+                    self._scan_folder(name, stamp)
+                    changed = True
+            if changed:
+                self.generation += 1
+
+    def _rescan_root(self):
+        names, root_files = [], []
+        try:
+            entries = sorted(os.scandir(self.root), key=lambda e: e.name)
+        except OSError:
+            entries = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                names.append(entry.name)
+            elif Path(entry.name).suffix in AUDIO_EXTENSIONS:
+                root_files.append({"name": entry.name, "size": entry.stat().st_size, "duration_ms": None})
+        self._folders = {n: self._folders.get(n) or {"stamp": -1} for n in names}
+        self._folder_names = names
+        self._root_files = root_files
+
+    def _scan_folder(self, name: str, stamp: tuple | None):
+        path = self.root / name
+        files = []
+        has_playlist = False
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+        except OSError:
+            entries = []
+        durations = None
+        for entry in entries:
+            if entry.name == "playlist.json":
+                has_playlist = True
+            elif entry.is_file() and Path(entry.name).suffix in AUDIO_EXTENSIONS:
+                if durations is None:
+                    durations = _durations(path)
+                files.append({"name": entry.name, "size": entry.stat().st_size, "duration_ms": durations.get(entry.name)})
+        self._folders[name] = {"stamp": stamp, "files": files, "has_playlist": has_playlist}
+
+    def folders(self, offset: int = 0, limit: int | None = None) -> tuple[list[dict], int]:
+        """Страница папок (name, files) и общее число папок."""
+        self.refresh()
+        with self._lock:
+            names = self._folder_names
+            page = names[offset:None if limit is None else offset + limit]
+            return [{"name": n, "files": self._folders[n]["files"]} for n in page], len(names)
+
+    def root_files(self) -> list[dict]:
+        self.refresh()
+        with self._lock:
+            return list(self._root_files)
+
+    def playlists(self, offset: int = 0, limit: int | None = None) -> tuple[list[str], int]:
+        """Папки с playlist.json (сохранённые через --fetch-playlist) и их общее число."""
+        self.refresh()
+        with self._lock:
+            names = [n for n in self._folder_names if self._folders[n]["has_playlist"]]
+        return names[offset:None if limit is None else offset + limit], len(names)
@@ -0,0 +1,161 @@
+"""Долгоживущий процесс librespot — устройство Spotify Connect для записи."""
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from .config import CACHE_DIR, LIBRESPOT_CMD
+from .spotify_controller import DEVICE_NAME, get_record_device_id
+
+# Строка stderr, после которой устройство залогинено и вот-вот появится в Web API
+READY_MARKERS = ("Authenticated as",)
+READY_TIMEOUT = 30.0
+# "Loading <Title> with Spotify URI <spotify:track:...>" — librespot начал грузить трек
+LOADING_RE = re.compile(r"Loading <.*> with Spotify URI <(spotify:[^>]+)>")
+# Опрос sp.devices() после готовности: 0.25 → 0.5 → 1 → 2 → 2 ... сек
+DEVICE_POLL_START = 0.25
+DEVICE_POLL_MAX = 2.0
+DEVICE_TIMEOUT = 15.0
+
+
+class LibrespotDevice:
+    """librespot с pipe-бэкендом в pipe_path. Запускается один раз и переживает много треков.
+
+    stderr читается в фоне (иначе при долгой работе буфер пайпа заполнится и librespot встанет);
+    последние строки доступны в stderr_tail() для диагностики.
+    passthrough — в pipe идёт исходный Ogg Vorbis вместо PCM (без декодирования и ресемплинга).
+    """
+
+    def __init__(
+        self,
+        pipe_path: str,
+        name: str = DEVICE_NAME,
+        cache_dir: Path = CACHE_DIR,
+        passthrough: bool = False,
+    ):
+        self.pipe_path = pipe_path
+        self.name = name
+        self.cache_dir = Path(cache_dir)
+        self.passthrough = passthrough
+        self.device_id: str | None = None
+        self._proc: subprocess.Popen | None = None
+        self._stderr: deque[str] = deque(maxlen=200)
+        self._reader: threading.Thread | None = None
+        self._ready = threading.Event()
+        self._loaded: list[str] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def is_running(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def command(self) -> list[str]:
+        use_oauth = os.environ.get("LIBRESPOT_USE_OAUTH") == "1" or Path("/.dockerenv").exists()
+        cmd = [
+            LIBRESPOT_CMD,
+            "--name", self.name,
+            "--backend", "pipe",
+            "--device", self.pipe_path,
+            "--bitrate", "320",
+            "--cache", str(self.cache_dir),
+            # После трека ничего не должно доигрываться в pipe
+            "--autoplay", "off",
+        ]
+        if self.passthrough:
+            cmd.append("--passthrough")
+        if use_oauth:
+            cmd.extend(["--enable-oauth", "--oauth-port", "0"])
+        return cmd
+
+    def ensure_running(self) -> bool:
+        """Запустить librespot, если он ещё не запущен или упал. True — был (пере)запуск."""
+        if self.is_running():
+            return False
+        self.stop()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._stderr.clear()
+        self._ready.clear()
+        self._loaded = []
+        self.device_id = None
+        self._proc = subprocess.Popen(
+            self.command(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        self._reader = threading.Thread(target=self._read_stderr, args=(self._proc,), daemon=True)
+        self._reader.start()
+        return True
+
+    def wait_ready(self, timeout: float = READY_TIMEOUT) -> bool:
+        """Дождаться логина librespot по stderr. False — процесс упал или не успел."""
+        deadline = time.monotonic() + timeout
+        while not self._ready.is_set():
+            if not self.is_running():
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._ready.wait(min(remaining, 0.5))
+        return True
+
+    def find_device_id(self, sp, timeout: float = DEVICE_TIMEOUT) -> str | None:
+        """ID устройства в Web API; после первого успеха берётся из памяти.
+
+        Web API опрашивается только после логина librespot, с растущим интервалом.
+        """
+        if self.device_id:
+            return self.device_id
+        if not self.wait_ready():
+            return None
+        deadline = time.monotonic() + timeout
+        delay = DEVICE_POLL_START
+        device_id = get_record_device_id(sp, self.name, exact=True)
+        while not device_id and time.monotonic() + delay < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, DEVICE_POLL_MAX)
+            device_id = get_record_device_id(sp, self.name, exact=True)
+        self.device_id = device_id
+        return device_id
+
+    def stop(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        if proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        if self._reader is not None:
+            self._reader.join(timeout=1)
+            self._reader = None
+
+    def stderr_tail(self, lines: int = 10) -> list[str]:
+        return list(self._stderr)[-lines:]
+
+    def loaded_uris(self, since: int = 0) -> list[str]:
+        """URI треков в порядке, в котором librespot начинал их загружать (с индекса since)."""
+        return self._loaded[since:]
+
+    def loaded_count(self) -> int:
+        return len(self._loaded)
+
+    def _read_stderr(self, proc: subprocess.Popen):
+        for raw in proc.stderr:
+            line = raw.decode(errors="replace").rstrip()
+            self._stderr.append(line)
+            if not self._ready.is_set() and any(m in line for m in READY_MARKERS):
+                self._ready.set()
+            loading = LOADING_RE.search(line)
+            if loading:
+                self._loaded.append(loading.group(1))
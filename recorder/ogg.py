@@ -0,0 +1,76 @@
+"""Ogg-поток из librespot --passthrough: разбор заголовков страниц без декодирования."""
+import struct
+
+CAPTURE_PATTERN = b"OggS"
+# "OggS", версия, флаги, granule (int64), serial, номер страницы, CRC, число сегментов
+PAGE_HEADER = struct.Struct("<4sBBqIIIB")
+FLAG_EOS = 0x04
+
+
+def _resync(buf: bytearray) -> bytearray:
+    """Хвост buf, с которого может начинаться следующая страница."""
+    idx = bytes(buf).find(CAPTURE_PATTERN, 1)
+    if idx > 0:
+        return buf[idx:]
+    for keep in range(len(CAPTURE_PATTERN) - 1, 0, -1):
+        if buf[-keep:] == CAPTURE_PATTERN[:keep]:
+            return buf[-keep:]
+    return bytearray()
+
+
+class OggPageScanner:
+    """Следит за страницами Ogg в потоке, который приходит кусками произвольной длины.
+
+    granule — последняя позиция в сэмплах (для Vorbis 44.1 кГц — длительность),
+    eos — пришла последняя страница логического потока (конец трека).
+    """
+
+    def __init__(self):
+        self.granule = 0
+        self.pages = 0
+        self.eos = False
+        self._header = bytearray()  # незаконченный заголовок страницы
+        self._skip = 0  # байт тела текущей страницы ещё впереди
+        self._eos_pending = False
+
+    def feed(self, data) -> int | None:
+        """Принять кусок потока. Возвращает смещение конца EOS-страницы внутри data или None."""
+        pos = 0
+        size = len(data)
+        while pos < size and not self.eos:
+            if self._skip:
+                step = min(self._skip, size - pos)
+                self._skip -= step
+                pos += step
+                if not self._skip and self._eos_pending:
+                    self.eos = True
+                    return pos
+                continue
+            need = PAGE_HEADER.size - len(self._header)
+            if need > 0:
+                self._header += data[pos:pos + need]
+                pos += min(need, size - pos)
+                if len(self._header) < PAGE_HEADER.size:
+                    break
+                if self._header[:4] != CAPTURE_PATTERN:
+                    # Потеря синхронизации: ищем следующий "OggS"
+                    self._header = _resync(self._header)
+                    continue
+            nsegs = self._header[PAGE_HEADER.size - 1]
+            need = PAGE_HEADER.size + nsegs - len(self._header)
+            if need > 0:
+                self._header += data[pos:pos + need]
+                pos += min(need, size - pos)
+                if len(self._header) < PAGE_HEADER.size + nsegs:
+                    break
+            _, _, flags, granule, _, _, _, _ = PAGE_HEADER.unpack_from(self._header)
+            self._skip = sum(self._header[PAGE_HEADER.size:])
+            self._eos_pending = bool(flags & FLAG_EOS)
+            if granule >= 0:
+                self.granule = granule
+            self.pages += 1
+            self._header = bytearray()
+            if not self._skip and self._eos_pending:
+                self.eos = True
+                return pos
+        return None
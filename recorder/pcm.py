@@ -0,0 +1,220 @@
+"""Сырой PCM из pipe-бэкенда librespot: s16le, 44.1 кГц, стерео."""
+import io
+import os
+import select
+import sys
+import time
+from array import array
+
+try:
+    import fcntl
+except ImportError:  # Windows: запись работает только через WSL
+    fcntl = None
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_WIDTH = 2
+FRAME_BYTES = CHANNELS * SAMPLE_WIDTH
+BYTES_PER_SEC = SAMPLE_RATE * FRAME_BYTES  # 176400 — 176.4 байта на миллисекунду
+CHUNK_BYTES = 64 * 1024
+
+# Пик ниже этого (из 32767) считается тишиной: примерно -36 dBFS
+SILENCE_PEAK = 512
+SILENCE_BLOCK_MS = 10
+# Тишина до начала трека (пока librespot грузит и буферизует) — практически цифровой ноль
+LEAD_SILENCE_PEAK = 8
+LEAD_TRIM_MAX_MS = 3000
+
+
+def expected_bytes(duration_ms: int) -> int:
+    """Длина трека в байтах PCM, выровненная по кадру."""
+    return round((duration_ms or 0) * SAMPLE_RATE / 1000) * FRAME_BYTES
+
+
+def ms_to_bytes(ms: float) -> int:
+    return int(ms * SAMPLE_RATE / 1000) * FRAME_BYTES
+
+
+def open_fifo_reader(path: str, timeout: float) -> io.FileIO | None:
+    """Открыть FIFO на чтение и дождаться данных от писателя не дольше timeout.
+
+    Обычный open() висит, пока librespot не откроет pipe, — поэтому O_NONBLOCK + poll,
+    а после появления данных дескриптор переводится обратно в блокирующий режим.
+    Если вместо данных пришёл только обрыв (писатель прошлого трека как раз закрыл pipe),
+    FIFO открывается заново.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        remaining = deadline - time.monotonic()
+        events = poller.poll(max(0, remaining) * 1000) if remaining > 0 else []
+        if events and events[0][1] & select.POLLIN:
+            break
+        os.close(fd)
+        if not events or time.monotonic() >= deadline:
+            return None
+        time.sleep(0.01)
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags & ~os.O_NONBLOCK)
+    return io.FileIO(fd, "rb", closefd=True)
+
+
+def wait_readable(reader: io.FileIO, timeout: float) -> bool:
+    ready, _, _ = select.select([reader], [], [], timeout)
+    return bool(ready)
+
+
+def drain_fifo(path: str) -> int:
+    """Выбросить всё, что уже лежит в FIFO, не дожидаясь писателя. Возвращает число байт.
+
+    Общий librespot держит pipe открытым: то, что он успел записать сверх прочитанного,
+    иначе достанется следующему треку как его начало.
+    """
+    drained = 0
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    except OSError:
+        return 0
+    try:
+        while True:
+            try:
+                data = os.read(fd, CHUNK_BYTES)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            drained += len(data)
+    finally:
+        os.close(fd)
+    return drained
+
+
+def _samples(data) -> array:
+    samples = array("h")
+    samples.frombytes(bytes(data[:len(data) - len(data) % SAMPLE_WIDTH]))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples
+
+
+def peak(data) -> int:
+    samples = _samples(data)
+    if not samples:
+        return 0
+    return max(max(samples), -min(samples))
+
+
+def first_sound(data, threshold: int = LEAD_SILENCE_PEAK) -> int | None:
+    """Смещение (по границе кадра) первого кадра громче threshold; None — в data только тишина."""
+    samples = _samples(data)
+    for idx, value in enumerate(samples):
+        if value > threshold or value < -threshold:
+            return idx // CHANNELS * FRAME_BYTES
+    return None
+
+
+class LeadTrimmer:
+    """Отрезает тишину в начале потока, но не больше max_bytes; дальше пропускает всё как есть."""
+
+    def __init__(self, max_bytes: int = LEAD_TRIM_MAX_MS * BYTES_PER_SEC // 1000):
+        self.max_bytes = max_bytes - max_bytes % FRAME_BYTES
+        self.trimmed = 0
+        self.done = False
+
+    def feed(self, data):
+        """Вернуть часть data после ведущей тишины (срез того же буфера, без копии)."""
+        if self.done:
+            return data
+        budget = self.max_bytes - self.trimmed
+        offset = first_sound(data[:budget])
+        if offset is None:
+            offset = min(len(data), budget)
+            offset -= offset % FRAME_BYTES
+            if offset >= budget:
+                self.done = True
+        else:
+            self.done = True
+        self.trimmed += offset
+        return data[offset:]
+
+
+def quietest_offset(data, start: int, end: int, target: int) -> int:
+    """Смещение внутри data[start:end] для разреза: начало самого тихого блока.
+
+    При равной громкости (например, цифровая тишина) берётся блок ближе к target.
+    Если тихих блоков нет вовсе — разрез ровно в target (слитный переход без паузы).
+    """
+    block = ms_to_bytes(SILENCE_BLOCK_MS)
+    best = None
+    for pos in range(start, max(start, end - block) + 1, block):
+        p = peak(data[pos:pos + block])
+        score = (p, abs(pos - target))
+        if best is None or score < best[0]:
+            best = (score, pos)
+    if best is None or best[0][0] > SILENCE_PEAK:
+        return target
+    return best[1]
+
+
+class PcmSplitter:
+    """Режет непрерывный поток PCM на треки без потерь и повторов.
+
+    Граница — ожидаемая длина трека (lengths, байты), уточнённая до самого тихого места
+    в окне ±window байт. Последний трек получает всё до конца потока.
+    lengths можно менять для ещё не начатых треков (например, убрать пропущенный).
+    """
+
+    def __init__(self, lengths: list[int], window: int):
+        self.lengths = lengths
+        self.window = window - window % FRAME_BYTES
+        self.current = 0
+        self.written = 0  # байт уже отдано текущему треку
+        self._pending = bytearray()
+
+    def feed(self, data) -> list[tuple[int, bytes]]:
+        """Принять порцию потока; вернуть куски (номер трека, байты) в порядке потока."""
+        self._pending += data
+        out: list[tuple[int, bytes]] = []
+        while self.current < len(self.lengths) - 1:
+            target = max(0, self.lengths[self.current] - self.written)
+            if len(self._pending) < target + self.window:
+                break
+            lo = max(0, target - self.window)
+            cut = quietest_offset(self._pending, lo, target + self.window, target)
+            self._emit(out, cut)
+            self.current += 1
+            self.written = 0
+        if self.current < len(self.lengths) - 1:
+            safe = max(0, self.lengths[self.current] - self.written - self.window)
+            safe = min(safe, len(self._pending))
+        else:
+            safe = len(self._pending)
+        safe -= safe % FRAME_BYTES
+        if safe:
+            self._emit(out, safe)
+        return out
+
+    def finish(self) -> list[tuple[int, bytes]]:
+        """Конец потока: оставшиеся границы режутся по тому, что есть, остаток — последнему треку."""
+        out: list[tuple[int, bytes]] = []
+        while self.current < len(self.lengths) - 1:
+            target = max(0, self.lengths[self.current] - self.written)
+            if target >= len(self._pending):
+                break
+            end = min(len(self._pending), target + self.window)
+            cut = quietest_offset(self._pending, max(0, target - self.window), end, target)
+            self._emit(out, cut)
+            self.current += 1
+            self.written = 0
+        if self._pending:
+            self._emit(out, len(self._pending))
+        return out
+
+    def _emit(self, out: list, size: int):
+        if size <= 0:
+            return
+        out.append((self.current, bytes(self._pending[:size])))
+        del self._pending[:size]
+        self.written += size
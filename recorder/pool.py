@@ -0,0 +1,61 @@
+"""Параллельная запись: у каждого воркера своё устройство librespot, FIFO и аккаунт Spotify."""
+import queue
+import threading
+import traceback
+from pathlib import Path
+from typing import Callable, Iterable
+
+from .librespot import LibrespotDevice
+from .spotify_controller import get_spotify_user_client
+
+_STOP = object()
+
+
+class RecordWorker:
+    """Воркер записи n (0-based). Клиент Web API создаётся лениво из OAuth-кэша воркера."""
+
+    def __init__(self, n: int, pipe_path: str, name: str, cache_dir: Path, passthrough: bool = False):
+        self.n = n
+        self.cache_dir = Path(cache_dir)
+        self.device = LibrespotDevice(pipe_path, name=name, cache_dir=self.cache_dir, passthrough=passthrough)
+        self._sp = None
+
+    def client(self):
+        if self._sp is None:
+            self._sp = get_spotify_user_client(self.cache_dir)
+        return self._sp
+
+    def stop(self):
+        self.device.stop()
+
+
+def run_pool(workers: list[RecordWorker], items: Iterable, handle: Callable[[RecordWorker, object], None]):
+    """Раздать items свободным воркерам: handle(worker, item) в потоке воркера.
+
+    items читается лениво — очередь не длиннее числа воркеров, поэтому генератор треков
+    подгружает страницы по ходу записи. Исключение в handle пишется в консоль и не роняет воркер.
+    """
+    jobs: queue.Queue = queue.Queue(maxsize=len(workers))
+
+    def _loop(worker: RecordWorker):
+        while True:
+            item = jobs.get()
+            if item is _STOP:
+                return
+            try:
+                handle(worker, item)
+            except Exception:
+                print(f"[!] Воркер {worker.n + 1}: ошибка записи", flush=True)
+                traceback.print_exc()
+
+    threads = [threading.Thread(target=_loop, args=(w,), daemon=True) for w in workers]
+    for t in threads:
+        t.start()
+    try:
+        for item in items:
+            jobs.put(item)
+    finally:
+        for _ in threads:
+            jobs.put(_STOP)
+        for t in threads:
+            t.join()
@@ -1,10 +1,8 @@
 
 import os
 import platform
-import subprocess
 import sys
-import tempfile
-import time
+import threading
 from pathlib import Path
 
 _log_file = None
@@ -23,16 +21,36 @@ def _log(msg: str, force: bool = False):
             pass
 
 from .config import (
-    LIBRESPOT_CMD,
-    FFMPEG_CMD,
-    PIPE_PATH,
     RECORDINGS_DIR,
-    CACHE_DIR,
+    SPOTIFY_FETCH_WORKERS,
+    RECORD_WORKERS,
     get_track_by_index,
+    worker_config,
     load_parse_json,
 )
-from .spotify_controller import get_spotify_user_client, play_track_on_device, get_record_device_id
-from parsers.spotify_parser import parse_spotify_playlist
+from .capture import (
+    GAPLESS_BATCH,
+    MANUAL_START_TIMEOUT,
+    START_TIMEOUT,
+    capture_track,
+    finish_encoder,
+    pump_track,
+    record_batch_continuous,
+)
+from .encode import EncodePool, Encoding, commit_partial, default_encoding, partial_path, stderr_tail, transcode
+from .fifo import FifoSession
+from .journal import DONE, ERROR, RECORDING, RecordJournal, track_key
+from .librespot import LibrespotDevice
+from .pcm import SAMPLE_RATE, drain_fifo, expected_bytes
+from .pool import RecordWorker, run_pool
+from .spotify_controller import get_spotify_user_client, has_user_token, play_track_on_device, pause_playback
+from parsers.spotify_parser import (
+    get_spotify_playlist_meta,
+    iter_spotify_tracks,
+    refresh_spotify_playlist,
+    spotify_playlist_header,
+    spotify_playlist_id,
+)
 
 
 def ensure_recordings_dir():
@@ -53,6 +71,17 @@ def safe_folder_name(name: str) -> str:
     return name.strip()[:100] or "playlist"
 
 
+def _new_fifo(fifos: FifoSession, name: str = "audio") -> str | None:
+    """FIFO для pipe-бэкенда librespot в каталоге сессии fifos."""
+    pipe_path = fifos.create(name)
+    if not pipe_path:
+        print("[!] mkfifo недоступен. Используй WSL.")
+        return None
+    if not _quiet:
+        _log(f"FIFO создан: {pipe_path}")
+    return pipe_path
+
+
 def run_record_track(
     track_index: int = 0,
     parse_path: Path | None = None,
@@ -60,8 +89,18 @@ def run_record_track(
     manual_play: bool = False,
     track_dict: dict | None = None,
     quiet: bool = False,
+    device: LibrespotDevice | None = None,
+    encoding: Encoding | None = None,
 ) -> Path | None:
-    """Записать один трек. Либо track_dict, либо (parse_path + track_index)."""
+    """Записать один трек. Либо track_dict, либо (parse_path + track_index).
+
+    device — уже созданный LibrespotDevice (общий на плейлист); без него librespot
+    запускается и останавливается только для этого трека.
+    Запись заканчивается по числу принятых кадров PCM, а не по таймеру с запасом.
+    encoding — формат файла (по умолчанию из RECORD_*); промежуточный файл перекодируется сразу.
+    С passthrough-форматом (ogg) пишется родной поток librespot быстрее реального времени.
+    """
+    encoding = encoding or default_encoding()
     global _log_file, _quiet
     _quiet = quiet
     RECORDINGS_DIR.mkdir(parents=True, exist_ok=True)
@@ -73,6 +112,7 @@ def run_record_track(
         def write(self, s): self.orig.write(s); self.f.write(s); self.f.flush()
         def flush(self): self.orig.flush(); self.f.flush()
     sys.stdout = TeeOut(_log_file, _orig_stdout)
+    fifos = FifoSession()
     try:
         if not _quiet:
             _log(f"Лог: {log_path}")
@@ -95,91 +135,48 @@ def run_record_track(
 
         uri = track.get("spotify_uri")
         duration_ms = track.get("duration_ms") or 0
-        duration_sec = (duration_ms / 1000) + 3
         if not _quiet:
-            _log(f"Трек: {track.get('title')} | URI: {uri} | длительность: {duration_sec:.0f} сек")
+            _log(f"Трек: {track.get('title')} | URI: {uri} | длительность: {duration_ms / 1000:.1f} сек")
 
         ensure_recordings_dir()
         if output_path is None:
             base_name = safe_filename(track)
-            output_path = RECORDINGS_DIR / f"{base_name}.mp3"
+            output_path = RECORDINGS_DIR / f"{base_name}{encoding.ext}"
         else:
             output_path = Path(output_path)
         if not _quiet:
             _log(f"Выходной файл: {output_path}")
 
-        pipe_path = PIPE_PATH
-        if not pipe_path:
-            pipe_path = tempfile.mktemp(prefix="spotify_fifo_", suffix="")
-            try:
-                os.mkfifo(pipe_path)
-            except OSError:
-                print("[!] mkfifo недоступен. Используй WSL.")
-                return None
-
-        if pipe_path and not os.path.exists(pipe_path):
-            try:
-                os.mkfifo(pipe_path)
-                if not _quiet:
-                    _log(f"FIFO создан: {pipe_path}")
-            except OSError as e:
-                _log(f"ОШИБКА создания FIFO: {e}", force=True)
+        if device is None:
+            pipe_path = _new_fifo(fifos)
+            if not pipe_path:
                 return None
+        else:
+            pipe_path = device.pipe_path
 
-        # 2. Запустить ffmpeg
-        ffmpeg_cmd = [
-            FFMPEG_CMD,
-            "-y",
-            "-f", "s16le",
-            "-ar", "44100",
-            "-ac", "2",
-            "-i", pipe_path,
-            "-t", str(int(duration_sec)),
-            "-c:a", "libmp3lame",
-            "-b:a", "320k",
-            str(output_path),
-        ]
+        # 2. Запустить ffmpeg: PCM из FIFO ему передаёт pump_track
+        capture_path = encoding.capture_path(output_path)
         if not _quiet:
-            _log("Запуск ffmpeg...")
-        ffmpeg_proc = subprocess.Popen(
-            ffmpeg_cmd,
-            stdin=subprocess.DEVNULL,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        # 3. Запустить librespot
-        CACHE_DIR.mkdir(parents=True, exist_ok=True)
-        use_oauth = os.environ.get("LIBRESPOT_USE_OAUTH") == "1" or Path("/.dockerenv").exists()
-        librespot_cmd = [
-            LIBRESPOT_CMD,
-            "--name", "RecordDevice",
-            "--backend", "pipe",
-            "--device", pipe_path,
-            "--bitrate", "320",
-            "--cache", str(CACHE_DIR),
-        ]
-        if use_oauth:
-            librespot_cmd.extend(["--enable-oauth", "--oauth-port", "0"])
+            _log("Запуск ffmpeg..." if not encoding.intermediate and not encoding.passthrough else f"Захват в {capture_path}...")
+        # Файл пишется под временным именем и переименовывается только целиком
+        ffmpeg_proc = encoding.start(partial_path(capture_path))
+        # 3. librespot: свой на один трек или общий на весь плейлист
+        own_device = device is None
+        if own_device:
+            device = LibrespotDevice(pipe_path, passthrough=encoding.passthrough)
         if not _quiet:
-            _log("Запуск librespot...")
-        librespot_proc = subprocess.Popen(
-            librespot_cmd,
-            stdin=subprocess.DEVNULL,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        time.sleep(5)
-
+            _log("Запуск librespot..." if not device.is_running() else "librespot уже запущен")
+        device.ensure_running()
+
+        sp = None
+        device_id = None
+        if not own_device:
+            # Хвост прошлого трека в общем pipe не должен стать началом этого
+            drain_fifo(pipe_path)
         if not manual_play:
             try:
                 sp = get_spotify_user_client()
-                device_id = get_record_device_id(sp)
-                if not device_id:
-                    for _ in range(6):
-                        time.sleep(2)
-                        device_id = get_record_device_id(sp)
-                        if device_id:
-                            break
+                device_id = device.find_device_id(sp)
                 if device_id:
                     if play_track_on_device(sp, uri, device_id):
                         if not _quiet:
@@ -199,40 +196,60 @@ def run_record_track(
         if manual_play and not _quiet:
             _log("РЕЖИМ РУЧНОЙ ИГРЫ: выбери RecordDevice и запусти трек")
 
+        # 4. Конец трека — когда пришло duration_ms * 176.4 байт (тишина до начала не в счёт)
+        #    или, для passthrough, страница Ogg с флагом EOS
+        expected = expected_bytes(duration_ms)
         if not _quiet:
-            _log(f"Ожидание {duration_sec:.0f} сек...")
-
-        try:
-            ffmpeg_proc.wait(timeout=duration_sec + 10)
-        except subprocess.TimeoutExpired:
+            _log("Приём Ogg до конца потока..." if encoding.passthrough else f"Приём PCM: ожидается {expected} байт...")
+        stats = pump_track(
+            pipe_path, ffmpeg_proc, duration_ms, encoding,
+            start_timeout=MANUAL_START_TIMEOUT if manual_play else START_TIMEOUT,
+        )
+        if not own_device and sp is not None and device_id:
+            # Общий librespot не должен писать в FIFO, пока его никто не читает
+            pause_playback(sp, device_id)
+        pcm_ok = finish_encoder(ffmpeg_proc) and stats["complete"]
+        if not _quiet or not pcm_ok:
+            if encoding.passthrough:
+                summary = (
+                    f"Ogg: {stats['bytes']} байт, {stats['pages']} страниц, "
+                    f"{stats['granule'] * 1000 // SAMPLE_RATE}/{duration_ms} мс"
+                    + ("" if stats["eos"] else ", без EOS")
+                )
+            else:
+                summary = (
+                    f"PCM: {stats['bytes']}/{expected} байт, тишина в начале {stats['trimmed']} байт, "
+                    f"пик {stats['peak']}"
+                )
+            _log(summary + (", поток встал" if stats["stalled"] else ""), force=not pcm_ok)
+        saved = pcm_ok and commit_partial(capture_path)
+        if not saved:
+            partial_path(capture_path).unlink(missing_ok=True)
+        elif encoding.intermediate:
             if not _quiet:
-                _log("ffmpeg timeout — остановка")
-            ffmpeg_proc.kill()
+                _log(f"Кодирование в {encoding.fmt}...")
+            saved = transcode(capture_path, output_path, encoding.fmt, encoding.bitrate)
+            if saved:
+                if not encoding.keep_intermediate:
+                    capture_path.unlink(missing_ok=True)
+            else:
+                _log(f"ОШИБКА кодирования, промежуточный файл оставлен: {capture_path}", force=True)
 
-        if not _quiet:
-            _log("Остановка librespot...")
-        librespot_proc.terminate()
-        try:
-            librespot_proc.wait(timeout=3)
-        except subprocess.TimeoutExpired:
-            librespot_proc.kill()
+        librespot_err = device.stderr_tail()
+        if own_device:
+            if not _quiet:
+                _log("Остановка librespot...")
+            device.stop()
 
-        ffmpeg_err = ffmpeg_proc.stderr.read().decode(errors="replace") if ffmpeg_proc.stderr else ""
-        librespot_err = librespot_proc.stderr.read().decode(errors="replace") if librespot_proc.stderr else ""
-        if not output_path.exists() and (ffmpeg_err or librespot_err):
+        ffmpeg_err = stderr_tail(ffmpeg_proc)
+        if not saved and (ffmpeg_err or librespot_err):
             _log("--- диагностика (файл не создан) ---", force=True)
-            for line in (ffmpeg_err or "").strip().split("\n")[-10:]:
+            for line in ffmpeg_err:
                 _log(f"  ffmpeg: {line}", force=True)
-            for line in (librespot_err or "").strip().split("\n")[-10:]:
+            for line in librespot_err:
                 _log(f"  librespot: {line}", force=True)
 
-        if pipe_path and pipe_path.startswith(tempfile.gettempdir()):
-            try:
-                os.remove(pipe_path)
-            except OSError:
-                pass
-
-        if output_path.exists():
+        if saved:
             if not _quiet:
                 size = output_path.stat().st_size
                 _log(f"ГОТОВО: {output_path} ({size} байт)")
@@ -240,6 +257,7 @@ def run_record_track(
         _log("ОШИБКА: файл не создан", force=True)
         return None
     finally:
+        fifos.close()
         _quiet = False
         sys.stdout = _orig_stdout
         if _log_file is not None:
@@ -250,18 +268,40 @@ def run_record_track(
             _log_file = None
 
 
-def fetch_and_save_playlist(playlist_url: str) -> Path:
-    """Скачать плейлист через API (работает на хосте) и сохранить в recordings/Name/playlist.json."""
+def fetch_and_save_playlist(playlist_url: str, incremental: bool = True) -> Path:
+    """Скачать плейлист через API (работает на хосте) и сохранить в recordings/Name/playlist.json.
+
+    incremental — если playlist.json уже есть, сверить snapshot_id: без изменений файл не трогается,
+    иначе догружаются только новые треки.
+    """
+    import json
     sp = get_spotify_user_client()
-    data = parse_spotify_playlist(sp, playlist_url)
-    playlist_title = data.get("title", "playlist")
-    folder_name = safe_folder_name(playlist_title)
+    playlist_id = spotify_playlist_id(playlist_url)
+    meta = get_spotify_playlist_meta(sp, playlist_id)
+    folder_name = safe_folder_name(meta.get("name") or "playlist")
     output_dir = RECORDINGS_DIR / folder_name
     output_dir.mkdir(parents=True, exist_ok=True)
     json_path = output_dir / "playlist.json"
-    import json
-    with open(json_path, "w", encoding="utf-8") as f:
+
+    previous = None
+    if incremental and json_path.exists():
+        try:
+            with open(json_path, encoding="utf-8") as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = None
+        if previous and previous.get("playlist_id") not in (None, playlist_id):
+            previous = None
+
+    data, changed = refresh_spotify_playlist(
+        sp, playlist_id, previous, meta=meta, workers=SPOTIFY_FETCH_WORKERS
+    )
+    if not changed:
+        return json_path
+    tmp_path = json_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, json_path)
     return json_path
 
 
@@ -271,20 +311,40 @@ def run_record_playlist(
     manual_play: bool = False,
     skip_existing: bool = True,
     progress_callback=None,
+    gapless: bool = False,
+    workers: int = RECORD_WORKERS,
+    encoding: Encoding | None = None,
+    cancel: threading.Event | None = None,
 ) -> list[Path]:
     """
     Записать все треки плейлиста. playlist_url_or_path — URL или путь к .json.
     В Docker API часто даёт 403 → используй --fetch-playlist на хосте.
+    gapless — треки играются очередью по GAPLESS_BATCH и пишутся одним потоком PCM,
+    который режется на файлы (без паддинга и потерь на стыках; не для manual_play).
+    workers — сколько устройств пишут одновременно (см. worker_config; manual_play — всегда одно).
+    encoding — формат файлов; с промежуточным форматом кодирование идёт отдельно от захвата.
+    Что уже записано, решает журнал папки (journal.jsonl), а не наличие файлов.
+    cancel — после cancel.set() новые треки не начинаются, начатые дописываются.
+    passthrough (ogg) пишется по треку: конец каждого виден по EOS, gapless не нужен.
     """
+    encoding = encoding or default_encoding()
+    gapless = gapless and not encoding.passthrough
     path = Path(playlist_url_or_path)
     if path.suffix == ".json" and path.exists():
         import json
         with open(path, encoding="utf-8") as f:
             data = json.load(f)
+        tracks = data.get("tracks", [])
+        total = len(tracks)
     elif "spotify" in playlist_url_or_path.lower():
         try:
             sp = get_spotify_user_client()
-            data = parse_spotify_playlist(sp, playlist_url_or_path)
+            playlist_id = spotify_playlist_id(playlist_url_or_path)
+            meta = get_spotify_playlist_meta(sp, playlist_id)
+            data = spotify_playlist_header(playlist_id, meta)
+            # Страницы догружаются по ходу записи — первый трек пишется сразу
+            tracks = iter_spotify_tracks(sp, playlist_id)
+            total = (meta.get("tracks") or {}).get("total") or 0
         except Exception as e:
             if "403" in str(e) or "unavailable" in str(e).lower():
                 print("Ошибка: API Spotify недоступен из контейнера (403 по гео).")
@@ -294,8 +354,7 @@ def run_record_playlist(
     else:
         raise ValueError("Укажи URL плейлиста или путь к playlist.json")
 
-    tracks = data.get("tracks", [])
-    playlist_title = data.get("title", "playlist")
+    playlist_title = data.get("title") or "playlist"
 
     folder_name = safe_folder_name(playlist_title)
     if output_dir is None:
@@ -304,42 +363,231 @@ def run_record_playlist(
     output_dir.mkdir(parents=True, exist_ok=True)
 
     recorded: list[Path] = []
-    total = len(tracks)
+    if manual_play:
+        workers = 1
+    journal = RecordJournal(output_dir)
+    # Папка, записанная до появления журнала: готовыми считаются файлы на месте
+    legacy = not journal.existed
+
+    def _is_recorded(track: dict, out_path: Path) -> bool:
+        if track_key(track) and not legacy:
+            return journal.is_done(track, out_path.name)
+        if not out_path.exists():
+            return False
+        journal.record(track, DONE, out_path)
+        return True
 
     def _report(i: int, status: str):
         if progress_callback:
             progress_callback(current=i, total=total, track=track, status=status)
 
-    for i, track in enumerate(tracks):
-        filename = safe_filename(track) + ".mp3"
-        out_path = output_dir / filename
-        if skip_existing and out_path.exists():
-            _report(i + 1, "skip")
-            if not progress_callback:
-                print(f"[{i+1}/{total}] Пропуск (уже есть): {track.get('title')}")
-            recorded.append(out_path)
-            continue
-        title_short = track.get("title", "?")
-        artists_str = ", ".join(track.get("artists", []))
-        if progress_callback:
-            _report(i + 1, "recording")
-        else:
-            print(f"[{i+1}/{total}] Запись: {title_short} — {artists_str}", end=" ... ", flush=True)
-        result = run_record_track(
-            track_dict=track,
-            output_path=out_path,
-            manual_play=manual_play,
-            quiet=bool(progress_callback),
-        )
-        if result:
+    def _pending():
+        """Треки, которые нужно записать: (номер, трек, путь); уже записанные пропускаются."""
+        for i, track in enumerate(tracks):
+            if cancel is not None and cancel.is_set():
+                return
+            filename = safe_filename(track) + encoding.ext
+            out_path = output_dir / filename
+            if skip_existing and _is_recorded(track, out_path):
+                if progress_callback:
+                    progress_callback(current=i + 1, total=total, track=track, status="skip")
+                else:
+                    print(f"[{i+1}/{total}] Пропуск (уже есть): {track.get('title')}")
+                recorded.append(out_path)
+                continue
+            yield i + 1, track, out_path
+
+    if not manual_play and (gapless or workers > 1 or encoding.intermediate):
+        _record_with_pool(_pending(), total, workers, gapless, recorded, progress_callback, encoding, journal)
+        return recorded
+
+    # Один librespot на весь плейлист: без повторного логина и ожидания устройства на каждом треке
+    device: LibrespotDevice | None = None
+    fifos = FifoSession()
+    try:
+        for i, track, out_path in _pending():
+            title_short = track.get("title", "?")
+            artists_str = ", ".join(track.get("artists", []))
             if progress_callback:
-                _report(i + 1, "ok")
+                _report(i, "recording")
             else:
-                print("OK")
-            recorded.append(result)
-        else:
-            if progress_callback:
-                _report(i + 1, "error")
+                print(f"[{i}/{total}] Запись: {title_short} — {artists_str}", end=" ... ", flush=True)
+            journal.record(track, RECORDING)
+            if device is None:
+                pipe_path = _new_fifo(fifos)
+                if pipe_path:
+                    device = LibrespotDevice(pipe_path, passthrough=encoding.passthrough)
+            result = run_record_track(
+                track_dict=track,
+                output_path=out_path,
+                manual_play=manual_play,
+                quiet=bool(progress_callback),
+                device=device,
+                encoding=encoding,
+            )
+            journal.record(track, DONE if result else ERROR, result)
+            if result:
+                if progress_callback:
+                    _report(i, "ok")
+                else:
+                    print("OK")
+                recorded.append(result)
             else:
-                print("ОШИБКА")
+                if progress_callback:
+                    _report(i, "error")
+                else:
+                    print("ОШИБКА")
+    finally:
+        if device is not None:
+            device.stop()
+        fifos.close()
     return recorded
+
+
+def _start_workers(count: int, fifos: FifoSession, passthrough: bool = False) -> list[RecordWorker]:
+    """Воркеры 0..count-1 по worker_config, у каждого свой FIFO в сессии fifos.
+
+    Дополнительный воркер без сохранённого токена (не выполнен --auth --worker N) пропускается:
+    вход через браузер заблокировал бы запись, а треки он всё равно не запишет.
+    """
+    workers = []
+    for n in range(count):
+        cfg = worker_config(n)
+        if n > 0 and not has_user_token(cfg["cache_dir"]):
+            print(f"[!] Воркер {n + 1} ({cfg['name']}) пропущен: нет токена, выполни --auth --worker {n + 1}", flush=True)
+            continue
+        pipe_path = _new_fifo(fifos, f"worker{n + 1}")
+        if not pipe_path:
+            continue
+        worker = RecordWorker(n, pipe_path, cfg["name"], cfg["cache_dir"], passthrough=passthrough)
+        try:
+            worker.client()
+        except Exception as e:
+            print(f"[!] Воркер {n + 1} ({cfg['name']}) пропущен: {e}", flush=True)
+            continue
+        workers.append(worker)
+    return workers
+
+
+def _record_with_pool(
+    pending,
+    total: int,
+    workers: int,
+    gapless: bool,
+    recorded: list[Path],
+    progress_callback=None,
+    encoding: Encoding | None = None,
+    journal: RecordJournal | None = None,
+):
+    """Записать треки pending на workers устройствах параллельно.
+
+    Без gapless свободный воркер берёт следующий трек; с gapless — следующую пачку
+    (не больше GAPLESS_BATCH, но так, чтобы работа досталась всем воркерам).
+    С промежуточным форматом записанный трек сразу уходит в EncodePool, а воркер
+    берёт следующий: статус трека — encoding, а ok или error — когда перекодирование
+    закончилось. В journal трек становится done, когда готов итоговый файл.
+    """
+    encoding = encoding or default_encoding()
+    status_lock = threading.Lock()
+    encoder_pool = EncodePool(encoding) if encoding.intermediate else None
+    outputs: dict[int, Path] = {}
+
+    def _journal(track: dict, state: str, path: Path | None = None):
+        if journal is not None:
+            journal.record(track, state, path)
+
+    def _on_status(i: int, track: dict, status: str):
+        if status == "recording":
+            _journal(track, RECORDING)
+        elif status == "error":
+            _journal(track, ERROR)
+        elif status == "ok":
+            _journal(track, DONE, outputs[i])
+        with status_lock:
+            if progress_callback:
+                progress_callback(current=i, total=total, track=track, status=status)
+            elif status == "recording":
+                artists_str = ", ".join(track.get("artists", []))
+                print(f"[{i}/{total}] Запись: {track.get('title', '?')} — {artists_str}", flush=True)
+            elif status == "encoding":
+                print(f"[{i}/{total}] {track.get('title', '?')} — записан, кодирование...", flush=True)
+            else:
+                mark = "OK" if status == "ok" else "ОШИБКА"
+                print(f"[{i}/{total}] {track.get('title', '?')} — {mark}", flush=True)
+
+    def _encode(i: int, track: dict, capture_path: Path):
+        out_path = outputs[i]
+
+        def _done(ok: bool):
+            if ok:
+                recorded.append(out_path)
+            _on_status(i, track, "ok" if ok else "error")
+
+        encoder_pool.submit(capture_path, out_path, on_done=_done)
+
+    def _record_track(worker: RecordWorker, item):
+        i, track, out_path = item
+        outputs[i] = out_path
+        capture_path = encoding.capture_path(out_path)
+        _on_status(i, track, "recording")
+        if capture_track(worker.device, worker.client(), track, capture_path, encoding):
+            if encoder_pool is not None:
+                _on_status(i, track, "encoding")
+                _encode(i, track, capture_path)
+            else:
+                _on_status(i, track, "ok")
+                recorded.append(out_path)
+        else:
+            _on_status(i, track, "error")
+
+    def _record_batch(worker: RecordWorker, batch):
+        for i, _, out_path in batch:
+            outputs[i] = out_path
+        captures = [(i, track, encoding.capture_path(out_path)) for i, track, out_path in batch]
+        if encoder_pool is None:
+            on_status = _on_status
+        else:
+            by_index = {i: path for i, _, path in captures}
+
+            def on_status(i: int, track: dict, status: str):
+                if status == "ok":
+                    _on_status(i, track, "encoding")
+                    _encode(i, track, by_index[i])
+                else:
+                    _on_status(i, track, status)
+
+        done = record_batch_continuous(
+            worker.device, worker.client(), captures, on_status=on_status, encoding=encoding
+        )
+        if encoder_pool is None:
+            recorded.extend(done)
+
+    def _batches(size: int):
+        batch = []
+        for item in pending:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    fifos = FifoSession()
+    pool = _start_workers(workers, fifos, encoding.passthrough)
+    if not pool:
+        fifos.close()
+        for i, track, _ in pending:
+            _on_status(i, track, "error")
+        return
+    try:
+        if gapless:
+            size = min(GAPLESS_BATCH, -(-total // len(pool))) if total else GAPLESS_BATCH
+            run_pool(pool, _batches(max(1, size)), _record_batch)
+        else:
+            run_pool(pool, pending, _record_track)
+    finally:
+        for worker in pool:
+            worker.stop()
+        fifos.close()
+        if encoder_pool is not None:
+            encoder_pool.close()
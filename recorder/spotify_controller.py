@@ -9,6 +9,7 @@ from .config import (
     SPOTIFY_CLIENT_SECRET,
     SPOTIFY_REDIRECT_URI,
     CACHE_DIR,
+    DEVICE_NAME,
 )
 
 SCOPES = [
@@ -16,17 +17,24 @@ SCOPES = [
     "user-read-playback-state",
     "user-read-private",
 ]
-DEVICE_NAME = "RecordDevice"
+OAUTH_CACHE_NAME = "spotify_oauth_cache"
 
 
-def get_spotify_user_client() -> Spotify:
+def has_user_token(cache_dir: Path = CACHE_DIR) -> bool:
+    """Есть ли в cache_dir сохранённый OAuth-токен (иначе get_spotify_user_client ждёт вход в браузере)."""
+    return (Path(cache_dir) / OAUTH_CACHE_NAME).is_file()
+
+
+def get_spotify_user_client(cache_dir: Path = CACHE_DIR) -> Spotify:
+    """OAuth-клиент аккаунта, чей токен лежит в cache_dir (у каждого воркера записи свой)."""
     if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET:
         raise ValueError(
             "Укажи SPOTIFY_CLIENT_ID и SPOTIFY_CLIENT_SECRET в .env"
         )
 
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    cache_path = str(CACHE_DIR / "spotify_oauth_cache")
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_path = str(cache_dir / OAUTH_CACHE_NAME)
     in_docker = Path("/.dockerenv").exists()
     open_browser = not in_docker
 
@@ -52,12 +60,18 @@ def get_spotify_user_client() -> Spotify:
     return Spotify(auth_manager=auth)
 
 
-def get_record_device_id(sp: Spotify) -> str | None:
+def get_record_device_id(sp: Spotify, device_name: str = DEVICE_NAME, exact: bool = False) -> str | None:
+    """exact — только точное имя: "RecordDevice" не должен найти "RecordDevice2" соседнего воркера."""
     try:
-        resp = sp.devices()
-        for d in resp.get("devices") or []:
+        devices = sp.devices().get("devices") or []
+        for d in devices:
+            if d.get("name") == device_name:
+                return d.get("id")
+        if exact:
+            return None
+        for d in devices:
             name = d.get("name")
-            if name == DEVICE_NAME or (name and DEVICE_NAME.lower() in name.lower()):
+            if name and device_name.lower() in name.lower():
                 return d.get("id")
     except Exception:
         pass
@@ -76,6 +90,15 @@ def play_track_on_device(sp: Spotify, track_uri: str, device_id: str | None = No
         return False
 
 
+def play_tracks_on_device(sp: Spotify, track_uris: list[str], device_id: str) -> bool:
+    """Поставить очередь из нескольких треков — librespot сыграет их подряд без пауз."""
+    try:
+        sp.start_playback(device_id=device_id, uris=track_uris)
+        return True
+    except Exception:
+        return False
+
+
 def pause_playback(sp: Spotify, device_id: str | None = None) -> bool:
     try:
         sp.pause_playback(device_id=device_id)
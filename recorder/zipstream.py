@@ -0,0 +1,191 @@
+"""ZIP без сжатия (STORED), который отдаётся потоком прямо из файлов, без временного архива.
+
+Размер архива известен заранее (Content-Length), а любой диапазон байт можно собрать
+заново (Range / докачка): заголовки детерминированы, CRC32 файлов кэшируется.
+"""
+import hashlib
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator
+
+READ_CHUNK = 1024 * 1024
+
+_LOCAL = struct.Struct("<IHHHHHIIIHH")
+_DESCRIPTOR = struct.Struct("<IIII")
+_CENTRAL = struct.Struct("<IHHHHHHIIIHHHHHII")
+_ZIP64_EXTRA = struct.Struct("<HHQ")
+_END64 = struct.Struct("<IQHHIIQQQQ")
+_LOCATOR64 = struct.Struct("<IIQI")
+_END = struct.Struct("<IHHHHIIH")
+
+# Бит 3 — CRC в дескрипторе после данных, бит 11 — имена в UTF-8
+_FLAGS = 0x0808
+_VERSION = 20
+_VERSION_ZIP64 = 45
+_MAX32 = 0xFFFFFFFF
+_MAX16 = 0xFFFF
+
+# CRC32 файла по (путь, размер, mtime_ns): докачка и повторные загрузки не читают файлы заново
+_crc_cache: dict[tuple[str, int, int], int] = {}
+_crc_lock = threading.Lock()
+CRC_CACHE_MAX = 100_000
+
+
+def _dos_time(mtime: float) -> tuple[int, int]:
+    t = time.localtime(max(mtime, 315532800))  # ZIP не умеет даты раньше 1980
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+class _Entry:
+    def __init__(self, arcname: str, path: Path):
+        st = path.stat()
+        if st.st_size >= _MAX32:
+            raise ValueError(f"Файл больше 4 ГБ: {path}")
+        self.path = path
+        self.name = arcname.encode("utf-8")
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.time, self.date = _dos_time(st.st_mtime)
+        self.offset = 0  # смещение локального заголовка в архиве
+
+    @property
+    def key(self) -> tuple[str, int, int]:
+        return str(self.path), self.size, self.mtime_ns
+
+    def local_header(self) -> bytes:
+        # Размеры известны заранее и пишутся сразу (это помогает потоковым распаковщикам), CRC — в дескрипторе
+        return _LOCAL.pack(
+            0x04034B50, _VERSION, _FLAGS, 0, self.time, self.date,
+            0, self.size, self.size, len(self.name), 0,
+        ) + self.name
+
+    def descriptor(self, crc: int) -> bytes:
+        return _DESCRIPTOR.pack(0x08074B50, crc, self.size, self.size)
+
+    def central(self, crc: int) -> bytes:
+        zip64 = self.offset >= _MAX32
+        extra = _ZIP64_EXTRA.pack(0x0001, 8, self.offset) if zip64 else b""
+        version = _VERSION_ZIP64 if zip64 else _VERSION
+        return _CENTRAL.pack(
+            0x02014B50, (3 << 8) | version, version, _FLAGS, 0, self.time, self.date,
+            crc, self.size, self.size, len(self.name), len(extra), 0, 0, 0,
+            0o100644 << 16, _MAX32 if zip64 else self.offset,
+        ) + self.name + extra
+
+    def central_size(self) -> int:
+        return _CENTRAL.size + len(self.name) + (_ZIP64_EXTRA.size if self.offset >= _MAX32 else 0)
+
+
+def _file_crc(entry: _Entry) -> int:
+    with _crc_lock:
+        crc = _crc_cache.get(entry.key)
+    if crc is not None:
+        return crc
+    crc = 0
+    with open(entry.path, "rb") as f:
+        while chunk := f.read(READ_CHUNK):
+            crc = zlib.crc32(chunk, crc)
+    _remember_crc(entry, crc)
+    return crc
+
+
+def _remember_crc(entry: _Entry, crc: int):
+    with _crc_lock:
+        if len(_crc_cache) >= CRC_CACHE_MAX:
+            _crc_cache.clear()
+        _crc_cache[entry.key] = crc
+
+
+class ZipStream:
+    """Архив STORED из files: (имя в архиве, путь). Порядок файлов задаёт вызывающий.
+
+    size — точная длина архива, etag — меняется вместе с именами, размерами и mtime файлов.
+    iter_range(start, end) отдаёт байты [start, end) кусками, читая с диска только нужное.
+    Файл, изменившийся во время отдачи, даст битый архив — ETag для If-Range это ловит.
+    """
+
+    def __init__(self, files: list[tuple[str, Path]]):
+        self.entries = [_Entry(name, Path(path)) for name, path in files]
+        offset = 0
+        for entry in self.entries:
+            entry.offset = offset
+            offset += _LOCAL.size + len(entry.name) + entry.size + _DESCRIPTOR.size
+        self.central_offset = offset
+        self.central_size = sum(e.central_size() for e in self.entries)
+        self.zip64 = (
+            self.central_offset >= _MAX32
+            or self.central_offset + self.central_size >= _MAX32
+            or len(self.entries) >= _MAX16
+        )
+        self.size = self.central_offset + self.central_size + len(self._end())
+        digest = hashlib.sha1()
+        for entry in self.entries:
+            digest.update(b"%s\0%d\0%d\n" % (entry.name, entry.size, entry.mtime_ns))
+        self.etag = f'"zip-{digest.hexdigest()[:20]}-{self.size}"'
+
+    def _end(self) -> bytes:
+        count = len(self.entries)
+        if not self.zip64:
+            return _END.pack(0x06054B50, 0, 0, count, count, self.central_size, self.central_offset, 0)
+        end64_offset = self.central_offset + self.central_size
+        return (
+            _END64.pack(
+                0x06064B50, _END64.size - 12, (3 << 8) | _VERSION_ZIP64, _VERSION_ZIP64, 0, 0,
+                count, count, self.central_size, self.central_offset,
+            )
+            + _LOCATOR64.pack(0x07064B50, 0, end64_offset, 1)
+            + _END.pack(0x06054B50, 0, 0, _MAX16, _MAX16, _MAX32, _MAX32, 0)
+        )
+
+    def _segments(self):
+        """(смещение, длина, источник): bytes-фабрика или файл записи."""
+        for entry in self.entries:
+            header_size = _LOCAL.size + len(entry.name)
+            yield entry.offset, header_size, entry.local_header
+            yield entry.offset + header_size, entry.size, entry
+            yield entry.offset + header_size + entry.size, _DESCRIPTOR.size, lambda e=entry: e.descriptor(_file_crc(e))
+        offset = self.central_offset
+        for entry in self.entries:
+            size = entry.central_size()
+            yield offset, size, lambda e=entry: e.central(_file_crc(e))
+            offset += size
+        yield offset, self.size - offset, self._end
+
+    def iter_range(self, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+        end = self.size if end is None else min(end, self.size)
+        for offset, length, source in self._segments():
+            if offset + length <= start:
+                continue
+            if offset >= end:
+                break
+            lo = max(start, offset) - offset
+            hi = min(end, offset + length) - offset
+            if isinstance(source, _Entry):
+                yield from self._iter_file(source, lo, hi)
+            else:
+                yield source()[lo:hi]
+
+    def _iter_file(self, entry: _Entry, lo: int, hi: int) -> Iterator[bytes]:
+        # Файл целиком — CRC считается попутно и запоминается для дескриптора и каталога
+        whole = lo == 0 and hi == entry.size
+        with _crc_lock:
+            if entry.key in _crc_cache:
+                whole = False
+        crc = 0
+        with open(entry.path, "rb") as f:
+            if lo:
+                f.seek(lo)
+            remaining = hi - lo
+            while remaining > 0:
+                chunk = f.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    raise OSError(f"Файл укоротился во время отдачи: {entry.path}")
+                if whole:
+                    crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+                yield chunk
+        if whole:
+            _remember_crc(entry, crc)
@@ -15,7 +15,16 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from recorder.record import run_record_track, run_record_playlist
-from recorder.config import load_parse_json, PROJECT_ROOT
+from recorder.config import (
+    load_parse_json,
+    PROJECT_ROOT,
+    RECORD_BITRATE,
+    RECORD_FORMAT,
+    RECORD_INTERMEDIATE,
+    RECORD_KEEP_INTERMEDIATE,
+    RECORD_WORKERS,
+)
+from recorder.encode import FORMATS, INTERMEDIATES, Encoding, reencode_folder
 
 
 def main():
@@ -38,7 +47,7 @@ def main():
         "-o", "--output",
         type=Path,
         default=None,
-        help="Путь для сохранения MP3",
+        help="Путь для сохранения файла",
     )
     parser.add_argument(
         "--manual",
@@ -73,20 +82,86 @@ def main():
         metavar="URL",
         help="Скачать плейлист с API (на хосте!) и сохранить в recordings/.../playlist.json",
     )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="С --fetch-playlist: скачать заново, не сверяя snapshot_id с сохранённым",
+    )
+    parser.add_argument(
+        "--gapless",
+        action="store_true",
+        help="С --playlist: играть треки очередью и резать один непрерывный поток на файлы",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(FORMATS),
+        default=RECORD_FORMAT,
+        help=f"Формат файлов (по умолчанию {RECORD_FORMAT})",
+    )
+    parser.add_argument(
+        "--bitrate",
+        default=RECORD_BITRATE,
+        help="Битрейт для mp3/opus/aac, например 256k (по умолчанию — свой у формата)",
+    )
+    parser.add_argument(
+        "--intermediate",
+        choices=sorted(INTERMEDIATES),
+        default=RECORD_INTERMEDIATE,
+        help="Захват без потерь в этот формат, кодирование — отдельно от захвата",
+    )
+    parser.add_argument(
+        "--keep-intermediate",
+        action="store_true",
+        default=RECORD_KEEP_INTERMEDIATE,
+        help="Не удалять промежуточные файлы (для --reencode)",
+    )
+    parser.add_argument(
+        "--reencode",
+        type=Path,
+        metavar="ПАПКА",
+        help="Перекодировать сохранённые промежуточные файлы папки в --format без перезаписи",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="С --playlist: сколько устройств пишут одновременно (по умолчанию RECORD_WORKERS)",
+    )
+    parser.add_argument(
+        "--worker",
+        type=int,
+        default=1,
+        metavar="N",
+        help="С --auth: авторизовать аккаунт воркера N (1 — основной)",
+    )
     parser.add_argument(
         "--no-skip",
         action="store_true",
         help="С --playlist: не пропускать уже записанные треки",
     )
     args = parser.parse_args()
+    try:
+        encoding = Encoding(args.format, args.bitrate, args.intermediate, args.keep_intermediate)
+    except ValueError as e:
+        parser.error(str(e))
 
     if args.auth:
         from recorder.spotify_controller import get_spotify_user_client
-        print("Авторизация Spotipy...")
-        sp = get_spotify_user_client()
+        from recorder.config import worker_config
+        cfg = worker_config(max(1, args.worker) - 1)
+        print(f"Авторизация Spotipy ({cfg['name']})...")
+        sp = get_spotify_user_client(cfg["cache_dir"])
         print("Готово! Токен сохранён. Можно запускать запись.")
         return
 
+    if args.reencode:
+        try:
+            done = reencode_folder(args.reencode, encoding)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Перекодировано: {len(done)} файлов в {args.format}.")
+        return
+
     if args.list:
         data = load_parse_json(args.parse)
         tracks = data.get("tracks", [])
@@ -101,7 +176,7 @@ def main():
 
     if args.fetch_playlist:
         from recorder.record import fetch_and_save_playlist
-        path = fetch_and_save_playlist(args.fetch_playlist)
+        path = fetch_and_save_playlist(args.fetch_playlist, incremental=not args.full)
         container_path = f"/app/recordings/{path.parent.name}/playlist.json"
         print(f"Плейлист сохранён: {path}")
         print("В контейнере: python run_record.py --playlist", container_path)
@@ -121,6 +196,7 @@ def main():
             track_dict=track_dict,
             output_path=args.output,
             manual_play=args.manual,
+            encoding=encoding,
         )
         if result is None:
             exit(1)
@@ -131,6 +207,9 @@ def main():
             playlist_url_or_path=args.playlist,
             manual_play=args.manual,
             skip_existing=not args.no_skip,
+            gapless=args.gapless,
+            workers=args.workers or RECORD_WORKERS,
+            encoding=encoding,
         )
         print(f"\nГотово: {len(recorded)} треков.")
         return
@@ -140,6 +219,7 @@ def main():
         parse_path=args.parse,
         output_path=args.output,
         manual_play=args.manual,
+        encoding=encoding,
     )
     if result is None:
         exit(1)
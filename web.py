@@ -5,41 +5,110 @@
 Запуск: uvicorn web:app --host 0.0.0.0 --port 8080
 """
 
+import asyncio
+import json
 import re
-import tempfile
 import threading
-import zipfile
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
-from urllib.parse import unquote
+from urllib.parse import quote, unquote
 
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Query
-from fastapi.responses import HTMLResponse, FileResponse
+import anyio
 
-from recorder.config import RECORDINGS_DIR
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+
+from recorder.config import RECORD_FORMAT, RECORDINGS_DIR
+from recorder.encode import AUDIO_EXTENSIONS, MEDIA_TYPES, Encoding
+from recorder.jobs import CANCELLED, DONE, ERROR, FINISHED, QUEUED, RUNNING, JobQueue
+from recorder.library import RecordingsIndex
 from recorder.record import (
     run_record_playlist,
     run_record_track,
     fetch_and_save_playlist,
     safe_folder_name,
 )
+from recorder.zipstream import ZipStream
 from parsers.spotify_parser import parse_spotify_track
 from recorder.spotify_controller import get_spotify_user_client
 
 app = FastAPI(title="Spotify Recorder")
 
-# Состояние записи (для polling)
-_recording_state = {
-    "running": False,
-    "type": None,  # "track" | "playlist"
-    "current": 0,
-    "total": 0,
-    "track": "",
-    "artists": "",
-    "status": "",  # skip | recording | ok | error
-    "error": None,
-    "playlist_name": "",
-}
-_state_lock = threading.Lock()
+# Очередь заданий записи: создаётся при первом обращении, выполняет их _job_worker
+_jobs: JobQueue | None = None
+_jobs_lock = threading.Lock()
+_jobs_wakeup = threading.Event()
+# Свободный воркер заглядывает в очередь не реже, чем раз в столько секунд
+JOB_POLL_INTERVAL = 5.0
+# Флаги отмены выполняемых заданий: id → Event для run_record_playlist(cancel=...)
+_cancel_events: dict[int, threading.Event] = {}
+# Индекс записей для списков (recorder/library.py), создаётся при первом обращении
+_recordings: RecordingsIndex | None = None
+
+
+def _queue() -> JobQueue:
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = JobQueue()
+        return _jobs
+
+
+# SSE: комментарий-пинг раз в столько секунд держит соединение через прокси и замечает ушедших клиентов
+SSE_KEEPALIVE = 15.0
+# Событий в очереди одного клиента; события — снимки состояния, старые можно выбросить
+SSE_QUEUE_SIZE = 16
+
+
+class _EventHub:
+    """Подписчики /api/events: у каждого своя asyncio.Queue в своём event loop.
+
+    publish() вызывается из потока записи — в очереди клиентов попадает через call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> tuple[asyncio.AbstractEventLoop, asyncio.Queue]:
+        sub = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SSE_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: tuple[asyncio.AbstractEventLoop, asyncio.Queue]):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, payload: str):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, payload)
+            except RuntimeError:  # loop клиента уже закрыт
+                self.unsubscribe((loop, queue))
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, payload: str):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(payload)
+
+
+_events = _EventHub()
+
+
+def _notify():
+    """Разослать подписчикам текущее состояние записи (на каждое изменение прогресса или очереди)."""
+    _events.publish(json.dumps(_status_snapshot(with_jobs=True), ensure_ascii=False))
+
+
+def _encoding(fmt: str, bitrate: str | None, intermediate: str | None) -> Encoding:
+    try:
+        return Encoding(fmt, bitrate or None, intermediate or None)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
 
 def _is_spotify_url(s: str) -> bool:
@@ -76,93 +145,39 @@ async def api_fetch(url: str = Query(..., description="Spotify playlist URL")):
 
 
 @app.post("/api/record")
-async def api_record(url: str = Query(..., description="Spotify track or playlist URL")):
-    """Запустить запись трека или плейлиста."""
+async def api_record(
+    url: str = Query(..., description="Spotify track or playlist URL"),
+    format: str = Query(RECORD_FORMAT, description="mp3 | opus | aac | flac | wav | ogg"),
+    bitrate: str | None = Query(None, description="Например 256k; пусто — по умолчанию для формата"),
+    intermediate: str | None = Query(None, description="Захват без потерь: flac | wav | raw"),
+    priority: int = Query(0, description="Больше — раньше в очереди"),
+):
+    """Поставить запись трека или плейлиста в очередь."""
     if not url or not url.strip():
         raise HTTPException(400, "Укажи ссылку на трек или плейлист Spotify")
+    encoding = _encoding(format, bitrate, intermediate)
 
     url = url.strip()
     if not _is_spotify_url(url):
         raise HTTPException(400, "Неверная ссылка Spotify")
 
-    with _state_lock:
-        if _recording_state["running"]:
-            raise HTTPException(409, "Запись уже выполняется")
-
     t = _extract_type(url)
-    if t == "track":
-
-        def _do_track():
-            try:
-                with _state_lock:
-                    _recording_state["running"] = True
-                    _recording_state["type"] = "track"
-                    _recording_state["current"] = 1
-                    _recording_state["total"] = 1
-                    _recording_state["error"] = None
-                sp = get_spotify_user_client()
-                track_dict = parse_spotify_track(sp, url)
-                with _state_lock:
-                    _recording_state["track"] = track_dict.get("title", "?")
-                    _recording_state["artists"] = ", ".join(track_dict.get("artists", []))
-                    _recording_state["status"] = "recording"
-                run_record_track(track_dict=track_dict, manual_play=False, quiet=True)
-                with _state_lock:
-                    _recording_state["status"] = "ok"
-            except Exception as e:
-                with _state_lock:
-                    _recording_state["error"] = str(e)
-                    _recording_state["status"] = "error"
-            finally:
-                with _state_lock:
-                    _recording_state["running"] = False
-
-        thread = threading.Thread(target=_do_track, daemon=True)
-        thread.start()
-        return {"ok": True, "type": "track"}
-
-    if t == "playlist":
-
-        def _do_playlist():
-            def on_progress(current, total, track, status):
-                with _state_lock:
-                    _recording_state["current"] = current
-                    _recording_state["total"] = total
-                    _recording_state["track"] = track.get("title", "?")
-                    _recording_state["artists"] = ", ".join(track.get("artists", []))
-                    _recording_state["status"] = status
-
-            try:
-                with _state_lock:
-                    _recording_state["running"] = True
-                    _recording_state["type"] = "playlist"
-                    _recording_state["error"] = None
-                recorded = run_record_playlist(
-                    playlist_url_or_path=url,
-                    manual_play=False,
-                    skip_existing=True,
-                    progress_callback=on_progress,
-                )
-                with _state_lock:
-                    _recording_state["playlist_name"] = ""
-            except Exception as e:
-                with _state_lock:
-                    _recording_state["error"] = str(e)
-                    _recording_state["status"] = "error"
-            finally:
-                with _state_lock:
-                    _recording_state["running"] = False
-
-        thread = threading.Thread(target=_do_playlist, daemon=True)
-        thread.start()
-        return {"ok": True, "type": "playlist"}
-
-    raise HTTPException(400, "Поддерживаются только треки и плейлисты")
+    if t not in ("track", "playlist"):
+        raise HTTPException(400, "Поддерживаются только треки и плейлисты")
+    job = _submit(t, url, encoding, priority)
+    return {"ok": True, "type": t, "job_id": job["id"], "job": job}
 
 
 @app.post("/api/record/json")
-async def api_record_json(path: str = Query(..., description="Folder name or path to playlist.json")):
-    """Записать плейлист из сохранённого JSON (обход 403). Можно указать имя папки."""
+async def api_record_json(
+    path: str = Query(..., description="Folder name or path to playlist.json"),
+    format: str = Query(RECORD_FORMAT, description="mp3 | opus | aac | flac | wav | ogg"),
+    bitrate: str | None = Query(None, description="Например 256k; пусто — по умолчанию для формата"),
+    intermediate: str | None = Query(None, description="Захват без потерь: flac | wav | raw"),
+    priority: int = Query(0, description="Больше — раньше в очереди"),
+):
+    """Поставить в очередь плейлист из сохранённого JSON (обход 403). Можно указать имя папки."""
+    encoding = _encoding(format, bitrate, intermediate)
     if "/" not in path and "\\" not in path:
         p = RECORDINGS_DIR / path / "playlist.json"
     else:
@@ -172,135 +187,468 @@ async def api_record_json(path: str = Query(..., description="Folder name or pat
     if not p.exists() or p.suffix != ".json":
         raise HTTPException(400, f"Файл не найден: {path}")
 
-    with _state_lock:
-        if _recording_state["running"]:
-            raise HTTPException(409, "Запись уже выполняется")
+    job = _submit("playlist", str(p), encoding, priority)
+    return {"ok": True, "type": "playlist", "job_id": job["id"], "job": job}
+
+
+def _submit(kind: str, source: str, encoding: Encoding, priority: int) -> dict:
+    params = {"format": encoding.fmt, "bitrate": encoding.bitrate, "intermediate": encoding.intermediate}
+    job = _queue().submit(kind, source, params, priority)
+    _jobs_wakeup.set()
+    _notify()
+    return job
+
+
+def _status_snapshot(with_jobs: bool = False) -> dict:
+    """Прогресс текущего (или последнего) задания и число заданий в очереди.
+
+    with_jobs — добавить список активных заданий (для событий SSE).
+    """
+    queue = _queue()
+    pending = queue.pending_count()
+    jobs = queue.list(limit=1)
+    job = jobs[0] if jobs else None
+    state = {
+        "running": pending > 0,
+        "queued": max(0, pending - 1),
+        "job_id": None,
+        "type": None,
+        "current": 0,
+        "total": 0,
+        "track": "",
+        "artists": "",
+        "status": "",
+        "error": None,
+    }
+    if job is not None:
+        state.update({k: job[k] for k in ("current", "total", "track", "artists", "status", "error")})
+        state["job_id"] = job["id"]
+        state["type"] = job["kind"]
+    if with_jobs:
+        state["jobs"] = [j for j in queue.list(limit=100) if j["state"] in (QUEUED, RUNNING)]
+    return state
+
 
-    def _do():
-        def on_progress(current, total, track, status):
-            with _state_lock:
-                _recording_state["current"] = current
-                _recording_state["total"] = total
-                _recording_state["track"] = track.get("title", "?")
-                _recording_state["artists"] = ", ".join(track.get("artists", []))
-                _recording_state["status"] = status
+@app.get("/api/status")
+async def api_status():
+    """Снимок состояния; интерфейс получает его же через /api/events без опроса."""
+    return _status_snapshot()
 
+
+@app.get("/api/events")
+async def api_events(request: Request):
+    """Поток Server-Sent Events: event "status" со снимком состояния при каждом изменении."""
+    sub = _events.subscribe()
+    _, queue = sub
+
+    async def _stream():
         try:
-            with _state_lock:
-                _recording_state["running"] = True
-                _recording_state["type"] = "playlist"
+            yield f"event: status\ndata: {json.dumps(_status_snapshot(with_jobs=True), ensure_ascii=False)}\n\n"
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: status\ndata: {payload}\n\n"
+        finally:
+            _events.unsubscribe(sub)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/jobs")
+async def api_jobs(
+    state: str | None = Query(None, description="queued | running | done | error | cancelled"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """Задания: сначала выполняемое и очередь по приоритету, затем завершённые."""
+    if state and state not in (QUEUED, RUNNING, *FINISHED):
+        raise HTTPException(400, f"Неизвестное состояние: {state}")
+    return {"jobs": _queue().list(state, limit, offset)}
+
+
+@app.get("/api/jobs/{job_id}")
+async def api_job(job_id: int):
+    job = _queue().get(job_id)
+    if job is None:
+        raise HTTPException(404, "Задание не найдено")
+    return job
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def api_job_cancel(job_id: int):
+    """Отменить задание. Выполняемый плейлист останавливается после текущего трека.
+
+    Запись одного трека прервать нельзя — для неё 409.
+    """
+    queue = _queue()
+    job = queue.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Задание не найдено")
+    if job["kind"] == "track" and job["state"] == RUNNING:
+        raise HTTPException(409, "Трек уже записывается, прервать нельзя")
+    job = queue.cancel(job_id)
+    with _jobs_lock:
+        event = _cancel_events.get(job_id)
+    if event is not None:
+        event.set()
+    _notify()
+    return job
+
+
+@app.post("/api/jobs/{job_id}/priority")
+async def api_job_priority(job_id: int, priority: int = Query(..., description="Больше — раньше в очереди")):
+    job = _queue().set_priority(job_id, priority)
+    if job is None:
+        raise HTTPException(404, "Задание не найдено")
+    _notify()
+    return job
+
+
+@app.on_event("startup")
+def _start_job_worker():
+    threading.Thread(target=_job_worker, daemon=True).start()
+    # Индекс строится заранее, чтобы первый запрос списка не ждал обхода диска
+    threading.Thread(target=lambda: _index().refresh(force=True), daemon=True).start()
+
+
+def _job_worker():
+    """Выполнять задания из очереди по одному: у записи одно устройство librespot на аккаунт."""
+    queue = _queue()
+    while True:
+        job = queue.claim()
+        if job is None:
+            _jobs_wakeup.wait(JOB_POLL_INTERVAL)
+            _jobs_wakeup.clear()
+            continue
+        _run_job(queue, job)
+
+
+def _run_job(queue: JobQueue, job: dict):
+    job_id = job["id"]
+    cancel = threading.Event()
+    if job["cancel_requested"]:
+        cancel.set()
+    with _jobs_lock:
+        _cancel_events[job_id] = cancel
+    _notify()
+    state, error = DONE, None
+    try:
+        params = job["params"]
+        encoding = Encoding(params.get("format") or RECORD_FORMAT, params.get("bitrate"), params.get("intermediate"))
+        if cancel.is_set():
+            state = CANCELLED
+        elif job["kind"] == "track":
+            sp = get_spotify_user_client()
+            track_dict = parse_spotify_track(sp, job["source"])
+            queue.update(
+                job_id, current=1, total=1, status="recording",
+                track=track_dict.get("title", "?"), artists=", ".join(track_dict.get("artists", [])),
+            )
+            _notify()
+            # Отмена могла прийти, пока задание бралось из очереди; дальше трек не прерывается
+            if cancel.is_set():
+                state = CANCELLED
+            else:
+                result = run_record_track(track_dict=track_dict, manual_play=False, quiet=True, encoding=encoding)
+                queue.update(job_id, status="ok" if result else "error")
+                if not result:
+                    state, error = ERROR, "Трек не записан"
+        else:
+            def on_progress(current, total, track, status):
+                queue.update(
+                    job_id, current=current, total=total, status=status,
+                    track=track.get("title", "?"), artists=", ".join(track.get("artists", [])),
+                )
+                if status == "ok":
+                    _index().invalidate()
+                _notify()
+
             run_record_playlist(
-                playlist_url_or_path=str(p),
+                playlist_url_or_path=job["source"],
                 manual_play=False,
                 skip_existing=True,
                 progress_callback=on_progress,
+                encoding=encoding,
+                cancel=cancel,
             )
-        except Exception as e:
-            with _state_lock:
-                _recording_state["error"] = str(e)
-        finally:
-            with _state_lock:
-                _recording_state["running"] = False
+            if cancel.is_set():
+                state = CANCELLED
+    except Exception as e:
+        state, error = ERROR, str(e)
+        queue.update(job_id, status="error")
+    finally:
+        with _jobs_lock:
+            _cancel_events.pop(job_id, None)
+        queue.finish(job_id, state, error)
+        _index().invalidate()
+        _notify()
 
-    threading.Thread(target=_do, daemon=True).start()
-    return {"ok": True, "type": "playlist"}
 
+def _index() -> RecordingsIndex:
+    global _recordings
+    with _jobs_lock:
+        if _recordings is None:
+            _recordings = RecordingsIndex(RECORDINGS_DIR)
+        return _recordings
 
-@app.get("/api/status")
-async def api_status():
-    with _state_lock:
-        return dict(_recording_state)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _cached_json(request: Request, etag: str, build) -> Response:
+    """JSON с ETag; при совпадении If-None-Match — 304 без сборки тела."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(build(), headers=headers)
 
 
 @app.get("/api/playlists")
-async def api_playlists():
+def api_playlists(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1, description="Пусто — все"),
+):
     """Плейлисты, сохранённые через fetch (для записи при 403)."""
-    if not RECORDINGS_DIR.exists():
-        return {"playlists": []}
-    playlists = []
-    for p in sorted(RECORDINGS_DIR.iterdir()):
-        if p.is_dir() and (p / "playlist.json").exists():
-            playlists.append(p.name)
-    return {"playlists": playlists}
+    index = _index()
+    index.refresh()
+    etag = f'"pl-{index.epoch}-{index.generation}-{offset}-{limit}"'
+
+    def _build():
+        playlists, total = index.playlists(offset, limit)
+        return {"playlists": playlists, "total": total, "offset": offset}
+
+    return _cached_json(request, etag, _build)
 
 
 @app.get("/api/recordings")
-async def api_recordings():
-    """Список папок и файлов в recordings."""
-    if not RECORDINGS_DIR.exists():
-        return {"folders": [], "files": []}
-    folders = []
-    root_files = []
-    for p in sorted(RECORDINGS_DIR.iterdir()):
-        if p.name.startswith("."):
-            continue
-        if p.is_dir():
-            tracks = [f.name for f in p.iterdir() if f.suffix == ".mp3"]
-            folders.append({"name": p.name, "tracks": tracks})
-        elif p.suffix == ".mp3":
-            root_files.append(p.name)
-    return {"folders": folders, "root_files": root_files}
+def api_recordings(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int | None = Query(50, ge=1, description="Папок на страницу; пусто — все"),
+):
+    """Папки (страница) и файлы в корне recordings: имена, размеры, длительности из журнала."""
+    index = _index()
+    index.refresh()
+    etag = f'"rec-{index.epoch}-{index.generation}-{offset}-{limit}"'
+
+    def _build():
+        folders, total = index.folders(offset, limit)
+        root_files = index.root_files() if offset == 0 else []
+        return {
+            "folders": [{**f, "tracks": [t["name"] for t in f["files"]]} for f in folders],
+            "root_files": [f["name"] for f in root_files],
+            "root_files_info": root_files,
+            "total": total,
+            "offset": offset,
+        }
 
+    return _cached_json(request, etag, _build)
 
-def _cleanup_temp(path: str):
-    try:
-        Path(path).unlink(missing_ok=True)
-    except OSError:
-        pass
 
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
 
-@app.get("/api/download-folder/{folder}")
-async def api_download_folder(folder: str, bg: BackgroundTasks):
-    """Скачать все треки папки одним ZIP-архивом."""
+
+def _parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Один диапазон из заголовка Range → [start, end). None — отдавать целиком.
+
+    Несколько диапазонов сразу не поддерживаются (отдаётся весь ответ, это допустимо по RFC 9110).
+    Непокрываемый диапазон — 416.
+    """
+    if not header:
+        return None
+    m = RANGE_RE.fullmatch(header.strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    if m.group(1):
+        start = int(m.group(1))
+        end = int(m.group(2)) + 1 if m.group(2) else size
+    else:
+        start, end = max(0, size - int(m.group(2))), size
+    end = min(end, size)
+    if start >= end:
+        raise HTTPException(416, "Диапазон вне файла", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _content_disposition(filename: str, disposition: str = "attachment") -> str:
+    if filename.isascii() and '"' not in filename:
+        return f'{disposition}; filename="{filename}"'
+    return f"{disposition}; filename*=utf-8''{quote(filename)}"
+
+
+@app.api_route("/api/download-folder/{folder}", methods=["GET", "HEAD"])
+async def api_download_folder(folder: str, request: Request):
+    """Скачать все треки папки одним ZIP-архивом.
+
+    Архив без сжатия собирается на лету из файлов: первый байт уходит сразу, длина известна заранее,
+    Range (с If-Range по ETag) позволяет докачку.
+    """
     folder = unquote(folder)
-    if re.search(r'[<>:"/\\|?*]', folder):
+    if re.search(r'[<>:"/\\|?*]', folder) or folder in (".", ".."):
         raise HTTPException(400, "Неверный путь")
     dir_path = RECORDINGS_DIR / folder
     if not dir_path.exists() or not dir_path.is_dir():
         raise HTTPException(404, "Папка не найдена")
-    mp3_files = [f for f in dir_path.iterdir() if f.is_file() and f.suffix == ".mp3"]
-    if not mp3_files:
-        raise HTTPException(404, "Нет MP3 в папке")
-    tmp = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
-    try:
-        with zipfile.ZipFile(tmp.name, "w", zipfile.ZIP_DEFLATED) as zf:
-            for f in mp3_files:
-                zf.write(f, f.name)
-        tmp.close()
-        bg.add_task(_cleanup_temp, tmp.name)
-        return FileResponse(
-            tmp.name,
-            filename=f"{folder}.zip",
-            media_type="application/zip",
-        )
-    except Exception:
-        _cleanup_temp(tmp.name)
-        raise
-
-
-@app.get("/api/download/{folder}/{filename}")
-async def api_download(folder: str, filename: str):
-    """Скачать MP3."""
-    folder = unquote(folder)
-    filename = unquote(filename)
-    if re.search(r'[<>:"/\\|?*]', folder + filename):
-        raise HTTPException(400, "Неверный путь")
-    path = RECORDINGS_DIR / folder / filename
-    if not path.exists() or not path.is_file():
-        raise HTTPException(404, "Файл не найден")
-    return FileResponse(path, filename=filename, media_type="audio/mpeg")
+    audio_files = sorted(f for f in dir_path.iterdir() if f.is_file() and f.suffix in AUDIO_EXTENSIONS)
+    if not audio_files:
+        raise HTTPException(404, "Нет записей в папке")
+    archive = ZipStream([(f.name, f) for f in audio_files])
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": archive.etag,
+        "Content-Disposition": _content_disposition(f"{folder}.zip"),
+    }
+    if_range = request.headers.get("if-range")
+    span = None
+    if if_range is None or if_range == archive.etag:
+        span = _parse_range(request.headers.get("range"), archive.size)
+    status = 200
+    start, end = 0, archive.size
+    if span is not None:
+        start, end = span
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{archive.size}"
+    headers["Content-Length"] = str(end - start)
+    if request.method == "HEAD":
+        return Response(status_code=status, headers=headers, media_type="application/zip")
+    return StreamingResponse(
+        archive.iter_range(start, end), status_code=status, headers=headers, media_type="application/zip"
+    )
+
+
+class _FileRangeResponse(Response):
+    """Байты [start, end) файла.
+
+    Если ASGI-сервер поддерживает расширение http.response.zerocopysend, файл уходит через sendfile
+    без копирования в Python; иначе читается кусками в потоке, не блокируя event loop.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: Path, start: int, end: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD" or self.status_code == 304:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        f = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.start,
+                    "count": self.end - self.start,
+                    "more_body": False,
+                })
+                return
+            await anyio.to_thread.run_sync(f.seek, self.start)
+            remaining = self.end - self.start
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(f.read, min(self.chunk_size, remaining))
+                remaining = remaining - len(chunk) if chunk else 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        finally:
+            await anyio.to_thread.run_sync(f.close)
 
 
-@app.get("/api/download/{filename}")
-async def api_download_root(filename: str):
-    """Скачать MP3 из корня recordings."""
-    filename = unquote(filename)
-    if re.search(r'[<>:"/\\|?*]', filename):
+def _recording_path(*parts: str) -> Path:
+    parts = tuple(unquote(p) for p in parts)
+    if any(re.search(r'[<>:"/\\|?*]', p) or p in (".", "..") for p in parts):
         raise HTTPException(400, "Неверный путь")
-    path = RECORDINGS_DIR / filename
-    if not path.exists() or not path.is_file():
+    path = RECORDINGS_DIR.joinpath(*parts)
+    if not path.is_file():
         raise HTTPException(404, "Файл не найден")
-    return FileResponse(path, filename=filename, media_type="audio/mpeg")
+    return path
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Условный GET: If-None-Match главнее If-Modified-Since (RFC 9110)."""
+    if request.headers.get("if-none-match") is not None:
+        return _etag_matches(request, etag)
+    since = request.headers.get("if-modified-since")
+    if not since:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def _serve_file(request: Request, path: Path, inline: bool = False) -> Response:
+    """Запись с Range, сильным ETag и Last-Modified (304 на повторный запрос).
+
+    ETag сильный: файлы записей заменяются только через os.replace, поэтому inode, размер
+    и mtime однозначно определяют содержимое.
+    """
+    st = path.stat()
+    size = st.st_size
+    etag = f'"{st.st_ino:x}-{size:x}-{st.st_mtime_ns:x}"'
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": "no-cache",
+        "Content-Disposition": _content_disposition(path.name, "inline" if inline else "attachment"),
+    }
+    media_type = MEDIA_TYPES.get(path.suffix, "application/octet-stream")
+    if _not_modified(request, etag, st.st_mtime):
+        return Response(status_code=304, headers=headers)
+    if_range = request.headers.get("if-range")
+    span = None
+    if if_range is None or if_range in (etag, last_modified):
+        span = _parse_range(request.headers.get("range"), size)
+    start, end, status = 0, size, 200
+    if span is not None:
+        start, end = span
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    headers["Content-Length"] = str(end - start)
+    return _FileRangeResponse(path, start, end, status, headers, media_type)
+
+
+@app.api_route("/api/download/{folder}/{filename}", methods=["GET", "HEAD"])
+async def api_download(folder: str, filename: str, request: Request):
+    """Скачать запись."""
+    return _serve_file(request, _recording_path(folder, filename))
+
+
+@app.api_route("/api/download/{filename}", methods=["GET", "HEAD"])
+async def api_download_root(filename: str, request: Request):
+    """Скачать запись из корня recordings."""
+    return _serve_file(request, _recording_path(filename))
+
+
+@app.api_route("/api/stream/{folder}/{filename}", methods=["GET", "HEAD"])
+async def api_stream(folder: str, filename: str, request: Request):
+    """Запись для <audio>: inline, с Range — плеер перематывает, не скачивая файл целиком."""
+    return _serve_file(request, _recording_path(folder, filename), inline=True)
+
+
+@app.api_route("/api/stream/{filename}", methods=["GET", "HEAD"])
+async def api_stream_root(filename: str, request: Request):
+    return _serve_file(request, _recording_path(filename), inline=True)
 
 
 _HTML_PAGE = """
@@ -336,6 +684,11 @@ _HTML_PAGE = """
         .track a { color: #58a6ff; text-decoration: none; }
         .track a:hover { text-decoration: underline; }
         .status-msg { margin-top: 0.5rem; font-size: 0.9rem; }
+        #player { width: 100%; margin-bottom: 1rem; position: sticky; top: 0; }
+        #player.hidden { display: none; }
+        .track-actions { display: flex; gap: 0.75rem; }
+        .job { padding: 0.25rem 0; color: #8b949e; display: flex; justify-content: space-between; align-items: center; }
+        .job button { padding: 0.15rem 0.5rem; font-size: 0.8rem; background: #21262d; color: #f85149; }
     </style>
 </head>
 <body>
@@ -344,6 +697,10 @@ _HTML_PAGE = """
 
     <div class="input-row">
         <input type="text" id="url" placeholder="https://open.spotify.com/track/... или /playlist/..." autocomplete="off">
+        <select id="format" style="padding:0.4rem;background:#161b22;border:1px solid #30363d;border-radius:6px;color:#e6edf3;">
+            <option value="">Формат по умолчанию</option>
+            <option value="mp3">MP3</option><option value="opus">Opus</option><option value="aac">AAC</option><option value="flac">FLAC</option><option value="wav">WAV</option><option value="ogg">Ogg (без перекодирования)</option>
+        </select>
         <button id="btn" onclick="startRecord()">Записать</button>
     </div>
     <details class="details-403" style="margin-top:1rem;">
@@ -360,10 +717,12 @@ _HTML_PAGE = """
         <div class="progress-bar"><div id="progressFill" class="progress-fill" style="width: 0%"></div></div>
         <div id="trackInfo" class="track-info"></div>
         <div id="error" class="error"></div>
+        <div id="jobsList" class="status-msg"></div>
     </div>
 
     <div class="recordings">
         <h2>Записи</h2>
+        <audio id="player" controls preload="none" class="hidden"></audio>
         <div id="recordingsList"></div>
     </div>
 
@@ -374,6 +733,8 @@ _HTML_PAGE = """
         const progressFill = document.getElementById('progressFill');
         const trackInfo = document.getElementById('trackInfo');
         const errorEl = document.getElementById('error');
+        const formatSel = document.getElementById('format');
+        const formatQuery = () => formatSel.value ? '&format=' + formatSel.value : '';
 
         function setProgress(running, current, total, track, artists, status, err) {
             if (running) {
@@ -383,6 +744,7 @@ _HTML_PAGE = """
                 trackInfo.textContent = track ? `${track}${artists ? ' — ' + artists : ''}` : '';
                 if (status === 'skip') trackInfo.textContent += ' (пропуск)';
                 else if (status === 'recording') trackInfo.textContent += ' ...';
+                else if (status === 'encoding') trackInfo.textContent += ' (кодирование)';
                 else if (status === 'ok') trackInfo.textContent += ' ✓';
                 else if (status === 'error') trackInfo.textContent += ' ✗';
                 errorEl.textContent = err || '';
@@ -392,26 +754,36 @@ _HTML_PAGE = """
             }
         }
 
-        async function pollStatus() {
-            const r = await fetch('/api/status');
-            const s = await r.json();
-            setProgress(s.running, s.current, s.total, s.track, s.artists, s.status, s.error);
-            return s.running;
+        const jobLabels = { queued: 'в очереди', running: 'идёт запись' };
+        function renderJobs(jobs) {
+            let html = '';
+            for (const j of jobs || []) {
+                const name = j.track && j.state === 'running' ? j.track : j.source.split('/').slice(-2).join('/');
+                html += '<div class="job"><span>#' + j.id + ' ' + escapeHtml(name) + ' — ' + jobLabels[j.state];
+                if (j.total) html += ' (' + j.current + '/' + j.total + ')';
+                if (j.cancel_requested) html += ', отменяется';
+                html += '</span>';
+                if (!(j.kind === 'track' && j.state === 'running')) html += '<button onclick="cancelJob(' + j.id + ')">Отменить</button>';
+                html += '</div>';
+            }
+            document.getElementById('jobsList').innerHTML = html;
         }
 
-        let pollTimer = null;
-        function startPolling() {
-            if (pollTimer) return;
-            pollTimer = setInterval(async () => {
-                const running = await pollStatus();
-                if (!running) {
-                    clearInterval(pollTimer);
-                    pollTimer = null;
-                    btn.disabled = false;
-                    document.getElementById('btnJson').disabled = false;
-                    loadRecordings();
-                }
-            }, 800);
+        // Прогресс приходит событиями с сервера (SSE); EventSource сам переподключается при обрыве
+        let wasRunning = false;
+        function listenStatus() {
+            const events = new EventSource('/api/events');
+            events.addEventListener('status', e => {
+                const s = JSON.parse(e.data);
+                setProgress(s.running, s.current, s.total, s.track, s.artists, s.status, s.error);
+                renderJobs(s.jobs);
+                if (wasRunning && !s.running) loadRecordings();
+                wasRunning = s.running;
+            });
+        }
+
+        async function cancelJob(id) {
+            await fetch('/api/jobs/' + id + '/cancel', { method: 'POST' });
         }
 
         async function startRecordJson() {
@@ -422,11 +794,9 @@ _HTML_PAGE = """
             document.getElementById('btnJson').disabled = true;
             errorEl.textContent = '';
             try {
-                const r = await fetch('/api/record/json?path=' + encodeURIComponent(folder), { method: 'POST' });
+                const r = await fetch('/api/record/json?path=' + encodeURIComponent(folder) + formatQuery(), { method: 'POST' });
                 const d = await r.json();
                 if (!r.ok) throw new Error(d.detail || 'Ошибка');
-                setProgress(true, 0, 1, 'Запуск...', '', '', '');
-                startPolling();
             } catch (e) {
                 errorEl.textContent = e.message;
             }
@@ -448,43 +818,69 @@ _HTML_PAGE = """
             btn.disabled = true;
             errorEl.textContent = '';
             try {
-                const r = await fetch('/api/record?url=' + encodeURIComponent(url), { method: 'POST' });
+                const r = await fetch('/api/record?url=' + encodeURIComponent(url) + formatQuery(), { method: 'POST' });
                 const d = await r.json();
                 if (!r.ok) throw new Error(d.detail || 'Ошибка');
-                setProgress(true, 0, 1, 'Запуск...', '', '', '');
-                startPolling();
+                urlInput.value = '';
             } catch (e) {
                 errorEl.textContent = e.message;
-                btn.disabled = false;
             }
+            btn.disabled = false;
+        }
+
+        // Папок на странице; браузер перепроверяет список по ETag и при 304 не получает тело заново
+        const RECORDINGS_PAGE = 50;
+        let recordingsLimit = RECORDINGS_PAGE;
+        function fmtDuration(ms) {
+            if (!ms) return '';
+            const sec = Math.round(ms / 1000);
+            return ' · ' + Math.floor(sec / 60) + ':' + String(sec % 60).padStart(2, '0');
         }
 
         async function loadRecordings() {
-            const r = await fetch('/api/recordings');
+            const r = await fetch('/api/recordings?limit=' + recordingsLimit);
             const d = await r.json();
             let html = '';
             for (const f of d.folders) {
                 html += '<div class="folder"><div class="folder-name">' + escapeHtml(f.name);
-                if (f.tracks.length > 0) {
+                if (f.files.length > 0) {
                     html += '<a href="/api/download-folder/' + encodeURIComponent(f.name) + '" class="dl-all" download>Скачать всё ZIP</a>';
                 }
                 html += '</div>';
-                for (const t of f.tracks) {
-                    html += '<div class="track"><span>' + escapeHtml(t) + '</span>';
-                    html += '<a href="/api/download/' + encodeURIComponent(f.name) + '/' + encodeURIComponent(t) + '" download>Скачать</a></div>';
+                for (const t of f.files) {
+                    html += '<div class="track"><span>' + escapeHtml(t.name) + '<span style="color:#8b949e">' + fmtDuration(t.duration_ms) + '</span></span>';
+                    const path = encodeURIComponent(f.name) + '/' + encodeURIComponent(t.name);
+                    html += '<span class="track-actions">' + playLink(path);
+                    html += '<a href="/api/download/' + path + '" download>Скачать</a></span></div>';
                 }
                 html += '</div>';
             }
+            if (d.total > d.folders.length) {
+                html += '<button onclick="recordingsLimit += RECORDINGS_PAGE; loadRecordings()">Показать ещё (' + (d.total - d.folders.length) + ')</button>';
+            }
             for (const t of d.root_files) {
                 html += '<div class="track"><span>' + escapeHtml(t) + '</span>';
-                html += '<a href="/api/download/' + encodeURIComponent(t) + '" download>Скачать</a></div>';
+                html += '<span class="track-actions">' + playLink(encodeURIComponent(t));
+                html += '<a href="/api/download/' + encodeURIComponent(t) + '" download>Скачать</a></span></div>';
             }
             document.getElementById('recordingsList').innerHTML = html || '<p style="color:#8b949e">Нет записей</p>';
         }
 
+        // Прослушивание: /api/stream отдаёт Range, плеер грузит только нужные куски
+        function playLink(path) {
+            return '<a href="#" data-path="' + escapeHtml(path) + '" onclick="play(this.dataset.path); return false;">▶</a>';
+        }
+
+        function play(path) {
+            const player = document.getElementById('player');
+            player.src = '/api/stream/' + path;
+            player.classList.remove('hidden');
+            player.play();
+        }
+
         function escapeHtml(s) { return s.replace(/&/g,'&amp;').replace(/</g,'&lt;').replace(/>/g,'&gt;').replace(/"/g,'&quot;'); }
 
-        pollStatus().then(() => { if (!document.hidden) { loadRecordings(); loadPlaylists(); } });
+        listenStatus();
         loadRecordings();
         loadPlaylists();
     </script>